@@ -0,0 +1,34 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BOOT_CODE = 'import django; django.setup(); from star_burger import wsgi'
+
+
+def measure_boot():
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'star_burger.settings'}
+    started_at = time.perf_counter()
+    subprocess.run([sys.executable, '-c', BOOT_CODE], env=env, check=True)
+    return time.perf_counter() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time a cold start of the Django app, as a gunicorn worker does it',
+    )
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    measure_boot()  # warm up the filesystem cache and .pyc files
+    timings = [measure_boot() for _ in range(args.runs)]
+    print(
+        f'{args.runs} boots: median {statistics.median(timings) * 1000:.0f} ms, '
+        f'min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,14 @@
 
 from django.contrib import admin
+from django.db import transaction
 from django.http import HttpResponseRedirect
 from django.shortcuts import reverse
 from django.templatetags.static import static
 from django.utils.html import format_html
 from django.utils.http import url_has_allowed_host_and_scheme
 
-from .models import Order, OrderItem, Product, Restaurant, RestaurantMenuItem
+from .models import (Banner, IdempotencyKey, Order, OrderItem, Product,
+                     Restaurant, RestaurantMenuItem)
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
@@ -29,6 +31,20 @@ class RestaurantAdmin(admin.ModelAdmin):
     inlines = [
         RestaurantMenuItemInline
     ]
+    actions = ['make_menu_available', 'make_menu_unavailable']
+
+    def set_menu_availability(self, request, queryset, availability):
+        with transaction.atomic():
+            updated = RestaurantMenuItem.objects.filter(restaurant__in=queryset).set_availability(availability)
+        self.message_user(request, f'Изменено пунктов меню: {updated}')
+
+    def make_menu_available(self, request, queryset):
+        self.set_menu_availability(request, queryset, True)
+    make_menu_available.short_description = 'Вернуть в продажу всё меню'
+
+    def make_menu_unavailable(self, request, queryset):
+        self.set_menu_availability(request, queryset, False)
+    make_menu_unavailable.short_description = 'Снять с продажи всё меню'
 
 
 @admin.register(Product)
@@ -79,6 +95,7 @@ class ProductAdmin(admin.ModelAdmin):
     readonly_fields = [
         'get_image_preview',
     ]
+    actions = ['make_available', 'make_unavailable']
 
     class Media:
         css = {
@@ -100,6 +117,19 @@ class ProductAdmin(admin.ModelAdmin):
         return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.image.url)
     get_image_list_preview.short_description = 'превью'
 
+    def set_availability(self, request, queryset, availability):
+        with transaction.atomic():
+            updated = RestaurantMenuItem.objects.filter(product__in=queryset).set_availability(availability)
+        self.message_user(request, f'Изменено пунктов меню: {updated}')
+
+    def make_available(self, request, queryset):
+        self.set_availability(request, queryset, True)
+    make_available.short_description = 'Вернуть в продажу во всех ресторанах'
+
+    def make_unavailable(self, request, queryset):
+        self.set_availability(request, queryset, False)
+    make_unavailable.short_description = 'Снять с продажи во всех ресторанах'
+
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -109,7 +139,7 @@ class OrderItemInline(admin.TabularInline):
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'order_cost', 'firstname', 'lastname', 'status',
                     'called_at', 'delivered_at', 'payment_method')
-    readonly_fields = ('created_at',)
+    readonly_fields = ('created_at', 'total_cost')
     list_filter = ('status', 'called_at', 'delivered_at')
     inlines = [
         OrderItemInline,
@@ -124,10 +154,7 @@ class OrderAdmin(admin.ModelAdmin):
 
     def order_cost(self, obj):
         return f"{obj.total_cost} руб."
-
-    def get_queryset(self, request):
-        orders = super().get_queryset(request)
-        return orders.calculate_total_cost()
+    order_cost.admin_order_field = 'total_cost'
 
     def save_formset(self, request, form, formset, change):
         order_items = formset.save(commit=False)
@@ -144,3 +171,16 @@ class OrderAdmin(admin.ModelAdmin):
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(Banner)
+class BannerAdmin(admin.ModelAdmin):
+    list_display = ['title', 'text', 'order', 'is_active']
+    list_editable = ['order', 'is_active']
+    list_filter = ['is_active']
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['key_hash', 'created_at', 'response_status']
+    readonly_fields = ['created_at']
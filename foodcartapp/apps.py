@@ -1,6 +1,28 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+def is_management_command():
+    """Tell if Django runs a management command rather than serves requests.
+
+    Web workers init Rollbar in its middleware, so only management
+    commands need it from here.
+    """
+    if os.path.basename(sys.argv[0]) != 'manage.py':
+        return False
+    return sys.argv[1:2] != ['runserver']
 
 
 class FoodcartappConfig(AppConfig):
     default_auto_field = 'django.db.models.AutoField'
     name = 'foodcartapp'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if settings.ROLLBAR['access_token'] and is_management_command():
+            import rollbar
+            rollbar.init(**settings.ROLLBAR)
@@ -0,0 +1,105 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from geocoder.geocoder_functions import get_existed_places
+
+from .menu_cache import find_capable_restaurants, get_product_restaurants, get_restaurant_index
+from .models import Order, RestaurantLoad
+
+
+def score_by_distance_and_load(distance, load):
+    """Default scorer, lower is better.
+
+    Every open order of a restaurant costs as much as
+    ASSIGNMENT_LOAD_PENALTY_KM of extra distance.
+    """
+    return distance + load * settings.ASSIGNMENT_LOAD_PENALTY_KM
+
+
+def get_scorer():
+    return import_string(settings.ASSIGNMENT_SCORER)
+
+
+def choose_restaurants(orders, restaurant_index, loads, scorer, radius_km):
+    """Pick a restaurant for every order, pure function over prepared data.
+
+    `orders` is an iterable of (key, (lon, lat), capable restaurant ids),
+    `loads` is {restaurant_id: open orders}. Each choice adds to the load
+    of the chosen restaurant, so one batch doesn't pile up on it. Orders
+    with no capable restaurant within `radius_km` are left out.
+    Returns {key: restaurant_id}.
+    """
+    loads = Counter(loads)
+    assignments = {}
+    for key, coordinates, restaurant_ids in orders:
+        if not restaurant_ids or not coordinates or None in coordinates:
+            continue
+        options = [
+            (scorer(distance, loads[restaurant_id]), distance, restaurant_id)
+            for restaurant_id, distance in restaurant_index.within(*coordinates, radius_km)
+            if restaurant_id in restaurant_ids
+        ]
+        if not options:
+            continue
+        *_, restaurant_id = min(options)
+        assignments[key] = restaurant_id
+        loads[restaurant_id] += 1
+    return assignments
+
+
+def get_restaurant_loads():
+    """Return {restaurant_id: number of assigned orders that are not done}."""
+    return {
+        restaurant_load.restaurant_id: restaurant_load.open_orders
+        for restaurant_load in RestaurantLoad.objects.all()
+    }
+
+
+def assign_restaurants(orders, product_ids_by_order):
+    """Set `restaurant` of orders whose address is already geocoded.
+
+    `product_ids_by_order` is {order_id: [product_id, ...]}. Addresses are
+    not geocoded here, only cached coordinates are used. Orders that got
+    a restaurant from somebody else since they were read are left alone.
+    Returns the list of assigned orders.
+    """
+    orders = [order for order in orders if not order.restaurant_id]
+    if not orders:
+        return []
+
+    coordinates = get_existed_places({order.address for order in orders})
+    product_restaurants = get_product_restaurants()
+    assignments = choose_restaurants(
+        (
+            (
+                order.id,
+                coordinates.get(order.address),
+                find_capable_restaurants(product_ids_by_order[order.id], product_restaurants),
+            )
+            for order in orders
+        ),
+        get_restaurant_index(),
+        get_restaurant_loads(),
+        get_scorer(),
+        settings.RESTAURANT_SEARCH_RADIUS_KM,
+    )
+
+    with transaction.atomic():
+        statuses = dict(
+            Order.objects
+            .select_for_update()
+            .filter(id__in=assignments, restaurant__isnull=True)
+            .values_list('id', 'status')
+        )
+        assigned_orders = [order for order in orders if order.id in statuses]
+        for order in assigned_orders:
+            order.restaurant_id = assignments[order.id]
+            order.status = statuses[order.id]
+        Order.objects.bulk_update(assigned_orders, ['restaurant'])
+        RestaurantLoad.objects.apply_changes(Counter(
+            (order.restaurant_id, order.status) for order in assigned_orders
+        ))
+    return assigned_orders
@@ -0,0 +1,40 @@
+import json
+
+from django.core.cache import cache
+
+from star_burger.cache_versions import bump_version, get_version
+
+BANNERS_VERSION_KEY = 'foodcartapp:banners_version'
+BANNERS_CACHE_TIMEOUT = 60 * 10
+
+
+def bump_banners_version():
+    bump_version(BANNERS_VERSION_KEY)
+
+
+def build_banners_payload():
+    from .models import Banner
+
+    banners = Banner.objects.filter(is_active=True)
+    return json.dumps(
+        [
+            {
+                'title': banner.title,
+                'src': banner.image.url,
+                'text': banner.text,
+            }
+            for banner in banners
+        ],
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode()
+
+
+def get_banners_payload():
+    """Return JSON bytes of active banners, cached until a banner changes."""
+    cache_key = f'foodcartapp:banners_payload:{get_version(BANNERS_VERSION_KEY)}'
+    content = cache.get(cache_key)
+    if content is None:
+        content = build_banners_payload()
+        cache.set(cache_key, content, timeout=BANNERS_CACHE_TIMEOUT)
+    return content
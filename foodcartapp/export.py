@@ -0,0 +1,101 @@
+import csv
+import json
+from itertools import groupby
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Order, OrderItem
+
+ORDER_FIELDS = [
+    'id',
+    'created_at',
+    'status',
+    'payment_method',
+    'firstname',
+    'lastname',
+    'phonenumber',
+    'address',
+    'comment',
+    'restaurant_id',
+    'total_cost',
+    'called_at',
+    'delivered_at',
+]
+ORDER_ITEM_FIELDS = ['product_id', 'product__name', 'quantity', 'price']
+
+
+def iter_orders_with_items(since=None, chunk_size=2000):
+    """Yield (order, order_items) dicts ordered by (created_at, id).
+
+    Orders and items are read with two server-side cursors sorted the same
+    way and merged, so memory use doesn't depend on the number of orders.
+    """
+    orders = Order.objects.order_by('created_at', 'id')
+    order_items = OrderItem.objects.order_by('order__created_at', 'order_id', 'id')
+    if since:
+        orders = orders.filter(created_at__gt=since)
+        order_items = order_items.filter(order__created_at__gt=since)
+
+    orders = orders.values(*ORDER_FIELDS).iterator(chunk_size=chunk_size)
+    order_items = (
+        order_items
+        .values('order__created_at', 'order_id', *ORDER_ITEM_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    item_groups = groupby(
+        order_items,
+        key=lambda item: (item['order__created_at'], item['order_id']),
+    )
+
+    next_group = next(item_groups, None)
+    for order in orders:
+        order['phonenumber'] = str(order['phonenumber'])
+        order_key = (order['created_at'], order['id'])
+        # Skip items of orders committed after the orders cursor was opened
+        while next_group and next_group[0] < order_key:
+            next_group = next(item_groups, None)
+
+        items = []
+        if next_group and next_group[0] == order_key:
+            items = [
+                {field: item[field] for field in ORDER_ITEM_FIELDS}
+                for item in next_group[1]
+            ]
+            next_group = next(item_groups, None)
+        yield order, items
+
+
+def iter_ndjson(orders_with_items):
+    for order, order_items in orders_with_items:
+        yield json.dumps(
+            {**order, 'items': order_items},
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+        ) + '\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(orders_with_items):
+    """Yield CSV lines, one per order item with the order columns repeated."""
+    writer = csv.writer(Echo())
+    yield writer.writerow([*ORDER_FIELDS, *ORDER_ITEM_FIELDS])
+    empty_item = [''] * len(ORDER_ITEM_FIELDS)
+    for order, order_items in orders_with_items:
+        order_row = [order[field] for field in ORDER_FIELDS]
+        if not order_items:
+            yield writer.writerow([*order_row, *empty_item])
+        for order_item in order_items:
+            yield writer.writerow([
+                *order_row,
+                *(order_item[field] for field in ORDER_ITEM_FIELDS),
+            ])
+
+
+EXPORT_FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+    'csv': (iter_csv, 'text/csv'),
+}
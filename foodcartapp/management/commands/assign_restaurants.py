@@ -0,0 +1,56 @@
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodcartapp.assignment import assign_restaurants
+from foodcartapp.models import Order, OrderItem
+
+
+def get_product_ids_by_order(order_ids):
+    product_ids_by_order = defaultdict(list)
+    order_items = (
+        OrderItem.objects
+        .filter(order_id__in=order_ids)
+        .values_list('order_id', 'product_id')
+    )
+    for order_id, product_id in order_items:
+        product_ids_by_order[order_id].append(product_id)
+    return product_ids_by_order
+
+
+class Command(BaseCommand):
+    help = 'Assign restaurants to open orders which have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch_size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        unassigned_orders = (
+            Order.objects
+            .exclude(status=Order.OrderStatus.DONE)
+            .filter(restaurant__isnull=True)
+            .only('id', 'address', 'status', 'restaurant')
+            .order_by('id')
+        )
+        last_id = 0
+        checked, assigned = 0, 0
+        while True:
+            orders = list(unassigned_orders.filter(id__gt=last_id)[:options['batch_size']])
+            if not orders:
+                break
+            last_id = orders[-1].id
+            with transaction.atomic():
+                assigned_orders = assign_restaurants(
+                    orders,
+                    get_product_ids_by_order([order.id for order in orders]),
+                )
+            checked += len(orders)
+            assigned += len(assigned_orders)
+
+        elapsed = time.perf_counter() - started_at
+        self.stdout.write(
+            f'Assigned {assigned} of {checked} orders in {elapsed:.2f} s'
+        )
@@ -0,0 +1,74 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.assignment import choose_restaurants, score_by_distance_and_load
+from geocoder.spatial_index import GridIndex
+
+MOSCOW_LONLAT = 37.62, 55.75
+
+
+def random_lonlat(spread):
+    lon, lat = MOSCOW_LONLAT
+    return lon + random.uniform(-spread, spread), lat + random.uniform(-spread, spread)
+
+
+def make_synthetic_batch(orders_count, restaurants_count, products_count, items_count):
+    restaurant_ids = list(range(1, restaurants_count + 1))
+    restaurant_index = GridIndex({
+        restaurant_id: random_lonlat(0.3) for restaurant_id in restaurant_ids
+    })
+    product_restaurants = {
+        product_id: frozenset(random.sample(restaurant_ids, k=max(1, restaurants_count * 3 // 4)))
+        for product_id in range(products_count)
+    }
+    orders = []
+    for order_id in range(orders_count):
+        product_ids = random.sample(range(products_count), k=min(items_count, products_count))
+        capable = frozenset.intersection(*(product_restaurants[product_id] for product_id in product_ids))
+        orders.append((order_id, random_lonlat(0.4), capable))
+    loads = {restaurant_id: random.randint(0, 10) for restaurant_id in restaurant_ids}
+    return orders, restaurant_index, loads
+
+
+class Command(BaseCommand):
+    help = 'Time the restaurant assignment core on synthetic orders, no database involved'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--restaurants', type=int, default=50)
+        parser.add_argument('--products', type=int, default=40)
+        parser.add_argument('--items', type=int, default=3)
+        parser.add_argument('--radius', type=float, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        orders, restaurant_index, loads = make_synthetic_batch(
+            options['orders'],
+            options['restaurants'],
+            options['products'],
+            options['items'],
+        )
+
+        timings = []
+        for _ in range(options['repeat']):
+            started_at = time.perf_counter()
+            assignments = choose_restaurants(
+                orders,
+                restaurant_index,
+                loads,
+                score_by_distance_and_load,
+                options['radius'],
+            )
+            timings.append(time.perf_counter() - started_at)
+
+        best = min(timings)
+        self.stdout.write(
+            f'{len(orders)} orders, {len(restaurant_index)} restaurants: '
+            f'assigned {len(assignments)}\n'
+            f'Best of {len(timings)}: {best * 1000:.1f} ms, '
+            f'{len(orders) / best:.0f} orders/s'
+        )
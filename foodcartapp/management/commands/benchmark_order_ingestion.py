@@ -0,0 +1,73 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from foodcartapp.models import Product
+from foodcartapp.views import register_order, register_orders_bulk
+
+
+def make_order_payload(number, product_ids, items_count):
+    return {
+        'firstname': 'Бенчмарк',
+        'lastname': f'Заказ {number}',
+        'phonenumber': '+79001234567',
+        'address': f'Москва, Тестовая улица, {number}',
+        'products': [
+            {'product': product_id, 'quantity': random.randint(1, 3)}
+            for product_id in random.sample(product_ids, min(items_count, len(product_ids)))
+        ],
+    }
+
+
+def measure(func):
+    with CaptureQueriesContext(connection) as queries:
+        started_at = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started_at
+    return elapsed, len(queries)
+
+
+class Command(BaseCommand):
+    help = 'Compare N single order POSTs with one bulk POST, all changes are rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--items', type=int, default=3)
+
+    def handle(self, *args, **options):
+        product_ids = list(Product.objects.available().values_list('id', flat=True))
+        if not product_ids:
+            raise CommandError('No available products, run load_initial_data first')
+
+        payloads = [
+            make_order_payload(number, product_ids, options['items'])
+            for number in range(options['orders'])
+        ]
+        factory = APIRequestFactory()
+
+        def post_single_orders():
+            for payload in payloads:
+                response = register_order(factory.post('/api/order/', payload, format='json'))
+                assert response.status_code == 200, response.data
+
+        def post_bulk_orders():
+            response = register_orders_bulk(
+                factory.post('/api/orders/bulk/', payloads, format='json')
+            )
+            assert response.status_code == 200, response.data
+
+        with transaction.atomic():
+            single_time, single_queries = measure(post_single_orders)
+            bulk_time, bulk_queries = measure(post_bulk_orders)
+            transaction.set_rollback(True)
+
+        orders_count = len(payloads)
+        self.stdout.write(
+            f'{orders_count} single POSTs: {single_time:.3f} s, {single_queries} queries\n'
+            f'1 bulk POST:      {bulk_time:.3f} s, {bulk_queries} queries\n'
+            f'Speedup: {single_time / bulk_time:.1f}x'
+        )
@@ -0,0 +1,64 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from foodcartapp.export import EXPORT_FORMATS, iter_orders_with_items
+
+
+def read_watermark(watermark_path):
+    if not watermark_path or not os.path.exists(watermark_path):
+        return None
+    with open(watermark_path, 'r') as file_obj:
+        return file_obj.read().strip() or None
+
+
+def write_watermark(watermark_path, created_at):
+    with open(watermark_path, 'w') as file_obj:
+        file_obj.write(created_at.isoformat())
+
+
+class Command(BaseCommand):
+    help = 'Stream orders with their items as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--output', type=str,
+            help='File to write to, stdout by default')
+        parser.add_argument('--since', type=str,
+            help='Export orders created after this ISO datetime')
+        parser.add_argument('--watermark_file', type=str,
+            help='Read --since from this file and store the last exported created_at in it')
+        parser.add_argument('--chunk_size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        since = options['since'] or read_watermark(options['watermark_file'])
+        if since:
+            since = parse_datetime(since)
+            if not since:
+                raise CommandError('Watermark must be an ISO datetime')
+
+        last_created_at = None
+
+        def track_watermark(orders_with_items):
+            nonlocal last_created_at
+            for order, order_items in orders_with_items:
+                last_created_at = order['created_at']
+                yield order, order_items
+
+        serialize, _ = EXPORT_FORMATS[options['format']]
+        orders_with_items = track_watermark(
+            iter_orders_with_items(since, chunk_size=options['chunk_size'])
+        )
+
+        output = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for line in serialize(orders_with_items):
+                output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        if options['watermark_file'] and last_created_at:
+            write_watermark(options['watermark_file'], last_created_at)
@@ -1,11 +1,20 @@
+import hashlib
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
+from foodcartapp.menu_cache import bump_menu_version
 from foodcartapp.models import (Product, ProductCategory, Restaurant,
-                                RestaurantMenuItem)
+                                RestaurantLoad, RestaurantMenuItem)
+from geocoder.geocoder_functions import enqueue_addresses
+
+BULK_CHUNK_SIZE = 1000
 
 
 def upload_photo(photo_path, product):
@@ -59,6 +68,135 @@ def load_restaurants(file_path, set_all_available):
                 )
 
 
+def get_hashed_image_name(photo_path, photo):
+    """Name the image after its content, so an unchanged file keeps its name."""
+    stem, ext = os.path.splitext(os.path.basename(photo_path))
+    return f'{stem}_{hashlib.sha1(photo).hexdigest()[:12]}{ext}'
+
+
+def store_photo(photo_path, current_name):
+    """Save the photo unless storage already has the same content.
+
+    Returns the stored name, or None when `current_name` is up to date.
+    """
+    with open(photo_path, 'rb') as photo_obj:
+        photo = photo_obj.read()
+    image_name = get_hashed_image_name(photo_path, photo)
+    if image_name == current_name:
+        return None
+    if default_storage.exists(image_name):
+        return image_name
+    return default_storage.save(image_name, ContentFile(photo))
+
+
+def bulk_load_products(file_path, images_folder, workers):
+    """Return the number of inserted and updated rows.
+
+    Products are matched by name here, in Python: Product.name is not
+    unique in the database, so two runs must not overlap.
+    """
+    with open(file_path, 'r') as file_obj:
+        products_by_title = {}
+        for product in json.load(file_obj):
+            products_by_title.setdefault(product['title'], product)
+    products = list(products_by_title.values())
+
+    categories = dict(ProductCategory.objects.values_list('name', 'id'))
+    new_categories = {product['type'] for product in products} - categories.keys()
+    ProductCategory.objects.bulk_create(
+        [ProductCategory(name=name) for name in new_categories],
+        batch_size=BULK_CHUNK_SIZE,
+    )
+    categories = dict(ProductCategory.objects.values_list('name', 'id'))
+
+    existing_names = set(Product.objects.values_list('name', flat=True))
+    new_products = [
+        Product(
+            name=product['title'],
+            category_id=categories[product['type']],
+            price=product['price'],
+            description=product['description'],
+        )
+        for product in products
+        if product['title'] not in existing_names
+    ]
+    Product.objects.bulk_create(new_products, batch_size=BULK_CHUNK_SIZE)
+
+    products_by_name = {
+        product.name: product
+        for product in Product.objects.only('id', 'name', 'image')
+    }
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        image_names = executor.map(
+            lambda product: store_photo(
+                os.path.join(images_folder, product['img']),
+                products_by_name[product['title']].image.name,
+            ),
+            products,
+        )
+        changed_products = {}
+        for product, image_name in zip(products, image_names):
+            if image_name:
+                changed_product = products_by_name[product['title']]
+                changed_product.image = image_name
+                changed_products[changed_product.id] = changed_product
+    Product.objects.bulk_update(
+        changed_products.values(),
+        ['image'],
+        batch_size=BULK_CHUNK_SIZE,
+    )
+    return len(new_categories) + len(new_products), len(changed_products)
+
+
+def bulk_load_restaurants(file_path, set_all_available):
+    """Return the number of inserted rows."""
+    with open(file_path, 'r') as file_obj:
+        restaurants = json.load(file_obj)
+
+    existing_restaurants = set(
+        Restaurant.objects.values_list('name', 'address', 'contact_phone')
+    )
+    new_restaurants = {
+        (restaurant['title'], restaurant['address'], restaurant['contact_phone'])
+        for restaurant in restaurants
+    } - existing_restaurants
+    Restaurant.objects.bulk_create(
+        [
+            Restaurant(name=name, address=address, contact_phone=contact_phone)
+            for name, address, contact_phone in new_restaurants
+        ],
+        batch_size=BULK_CHUNK_SIZE,
+    )
+    # bulk_create skips the post_save signals of Restaurant
+    restaurant_ids = list(Restaurant.objects.values_list('id', flat=True))
+    RestaurantLoad.objects.bulk_create(
+        [RestaurantLoad(restaurant_id=restaurant_id) for restaurant_id in restaurant_ids],
+        batch_size=BULK_CHUNK_SIZE,
+        ignore_conflicts=True,
+    )
+    enqueue_addresses(address for _, address, _ in new_restaurants)
+
+    new_menu_items = 0
+    if set_all_available:
+        existing_menu_items = set(
+            RestaurantMenuItem.objects.values_list('restaurant_id', 'product_id')
+        )
+        product_ids = list(Product.objects.values_list('id', flat=True))
+        menu_items = [
+            RestaurantMenuItem(restaurant_id=restaurant_id, product_id=product_id)
+            for restaurant_id in restaurant_ids
+            for product_id in product_ids
+            if (restaurant_id, product_id) not in existing_menu_items
+        ]
+        RestaurantMenuItem.objects.bulk_create(
+            menu_items,
+            batch_size=BULK_CHUNK_SIZE,
+            ignore_conflicts=True,
+        )
+        new_menu_items = len(menu_items)
+    return len(new_restaurants) + new_menu_items
+
+
 class Command(BaseCommand):
     help = 'Load initial menu and restaurants to database'
 
@@ -70,7 +208,32 @@ class Command(BaseCommand):
         parser.add_argument('--images_folder', type=str,
             default='test_data/')
         parser.add_argument('-set', '--set_products_available', action='store_true')
+        parser.add_argument('--bulk', action='store_true',
+            help='Insert rows in chunks and skip images that did not change')
+        parser.add_argument('--workers', type=int, default=8,
+            help='Threads for image files in bulk mode')
 
     def handle(self, *args, **options):
-        load_products(options['products_path'], options['images_folder'])
-        load_restaurants(options['restaurants_path'], options['set_products_available'])
+        if not options['bulk']:
+            load_products(options['products_path'], options['images_folder'])
+            load_restaurants(options['restaurants_path'], options['set_products_available'])
+            return
+
+        started_at = time.perf_counter()
+        with transaction.atomic():
+            inserted, updated = bulk_load_products(
+                options['products_path'],
+                options['images_folder'],
+                options['workers'],
+            )
+            inserted += bulk_load_restaurants(
+                options['restaurants_path'],
+                options['set_products_available'],
+            )
+            # bulk_create and bulk_update skip the signals that bump it per row
+            transaction.on_commit(bump_menu_version)
+        elapsed = time.perf_counter() - started_at
+        self.stdout.write(
+            f'Inserted {inserted} rows, updated {updated} images in {elapsed:.2f} s, '
+            f'{(inserted + updated) / elapsed:.0f} rows/s'
+        )
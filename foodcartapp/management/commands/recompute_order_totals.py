@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Check stored order totals against order items and repair the wrong ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+            help='Recompute totals of mismatched orders')
+        parser.add_argument('--all', action='store_true',
+            help='Recompute totals of all orders without checking')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            with transaction.atomic():
+                updated = Order.objects.update_total_cost()
+            self.stdout.write(f'Recomputed {updated} order totals')
+            return
+
+        mismatched_ids = list(
+            Order.objects
+            .annotate_items_cost()
+            .exclude(total_cost=F('items_cost'))
+            .values_list('id', flat=True)
+        )
+        self.stdout.write(f'Found {len(mismatched_ids)} orders with wrong total')
+        if not mismatched_ids or not options['fix']:
+            return
+
+        with transaction.atomic():
+            updated = Order.objects.filter(pk__in=mismatched_ids).update_total_cost()
+        self.stdout.write(f'Fixed {updated} order totals')
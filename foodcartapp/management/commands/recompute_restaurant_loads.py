@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodcartapp.models import RestaurantLoad
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-restaurant order counters from the orders table'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            restaurant_loads = RestaurantLoad.objects.recompute()
+        self.stdout.write(f'Recomputed load of {len(restaurant_loads)} restaurants')
@@ -0,0 +1,198 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from foodcartapp.menu_cache import bump_menu_version
+from foodcartapp.models import Product, Restaurant, RestaurantMenuItem
+
+BULK_CHUNK_SIZE = 1000
+TRUE_VALUES = {'1', 'true', 'yes', 'да'}
+FALSE_VALUES = {'0', 'false', 'no', 'нет'}
+
+
+def iter_jsonl(feed):
+    for line_number, line in enumerate(feed, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise CommandError(f'Line {line_number}: {error}')
+        if not isinstance(record, dict):
+            raise CommandError(f'Line {line_number}: expected a JSON object')
+        yield line_number, record
+
+
+def iter_csv(feed):
+    reader = csv.DictReader(feed)
+    for row in reader:
+        record = {field: value for field, value in row.items() if value not in ('', None)}
+        yield reader.line_num, record
+
+
+FEED_FORMATS = {
+    'jsonl': iter_jsonl,
+    'csv': iter_csv,
+}
+
+
+def parse_availability(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f'Bad availability: {value}')
+
+
+def parse_price(value):
+    try:
+        price = Decimal(str(value)).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'Bad price: {value}')
+    if price < 0:
+        raise ValueError(f'Negative price: {value}')
+    return price
+
+
+class MenuDiff:
+    """Compare feed records with the current menu, keeping only the changes.
+
+    A record names a `product` and may carry its `price`, and with a
+    `restaurant` also the `availability` of the product there. Later
+    records override earlier ones. Lines are counted as changed or
+    unchanged against the stored menu, lines naming an unknown product or
+    restaurant are skipped as a whole.
+    """
+
+    def __init__(self):
+        self.products = {}
+        self.prices = {}
+        for product_id, name, price in Product.objects.values_list('id', 'name', 'price'):
+            self.products[name] = product_id
+            self.prices[product_id] = price
+        self.restaurants = dict(Restaurant.objects.values_list('name', 'id'))
+        self.menu_items = {
+            (restaurant_id, product_id): (menu_item_id, availability)
+            for menu_item_id, restaurant_id, product_id, availability
+            in RestaurantMenuItem.objects.values_list('id', 'restaurant_id', 'product_id', 'availability')
+        }
+        self.new_prices = {}
+        self.new_availability = {}
+        self.changed = 0
+        self.unchanged = 0
+        self.skipped = 0
+
+    def add(self, record):
+        product_id = self.products.get(record.get('product'))
+        restaurant_id = self.restaurants.get(record.get('restaurant'))
+        if not product_id or ('restaurant' in record and not restaurant_id):
+            self.skipped += 1
+            return
+
+        new_price = None
+        if 'price' in record:
+            new_price = parse_price(record['price'])
+        availability = None
+        if restaurant_id:
+            if 'availability' not in record:
+                raise ValueError('Missing availability')
+            availability = parse_availability(record['availability'])
+
+        changed = False
+        if new_price is not None:
+            self.new_prices[product_id] = new_price
+            changed = new_price != self.prices[product_id]
+        if availability is not None:
+            menu_item_key = restaurant_id, product_id
+            _, current_availability = self.menu_items.get(menu_item_key, (None, None))
+            self.new_availability[menu_item_key] = availability
+            changed = changed or availability != current_availability
+
+        if changed:
+            self.changed += 1
+        else:
+            self.unchanged += 1
+
+    def get_changes(self):
+        """Return (changed products, changed menu items, new menu items)."""
+        changed_products = [
+            Product(id=product_id, price=price)
+            for product_id, price in self.new_prices.items()
+            if price != self.prices[product_id]
+        ]
+        changed_menu_items = []
+        new_menu_items = []
+        for (restaurant_id, product_id), availability in self.new_availability.items():
+            menu_item_id, current_availability = self.menu_items.get(
+                (restaurant_id, product_id),
+                (None, None),
+            )
+            if menu_item_id is None:
+                new_menu_items.append(RestaurantMenuItem(
+                    restaurant_id=restaurant_id,
+                    product_id=product_id,
+                    availability=availability,
+                ))
+            elif availability != current_availability:
+                changed_menu_items.append(
+                    RestaurantMenuItem(id=menu_item_id, availability=availability)
+                )
+        return changed_products, changed_menu_items, new_menu_items
+
+
+def apply_changes(changed_products, changed_menu_items, new_menu_items):
+    Product.objects.bulk_update(changed_products, ['price'], batch_size=BULK_CHUNK_SIZE)
+    RestaurantMenuItem.objects.bulk_update(
+        changed_menu_items,
+        ['availability'],
+        batch_size=BULK_CHUNK_SIZE,
+    )
+    RestaurantMenuItem.objects.bulk_create(new_menu_items, batch_size=BULK_CHUNK_SIZE)
+    if changed_products or changed_menu_items or new_menu_items:
+        # bulk operations skip the signals that bump it per row
+        transaction.on_commit(bump_menu_version)
+
+
+class Command(BaseCommand):
+    help = 'Apply a JSON lines or CSV feed of prices and availability to the menu'
+
+    def add_arguments(self, parser):
+        parser.add_argument('feed_path', type=str)
+        parser.add_argument('--format', choices=FEED_FORMATS, default=None,
+            help='Feed format, guessed from the file extension by default')
+        parser.add_argument('--dry_run', action='store_true',
+            help='Only count the changes')
+
+    def handle(self, *args, **options):
+        feed_format = options['format'] or options['feed_path'].rsplit('.', 1)[-1]
+        if feed_format not in FEED_FORMATS:
+            raise CommandError('Unknown feed format, pass --format')
+
+        started_at = time.perf_counter()
+        menu_diff = MenuDiff()
+        with open(options['feed_path'], newline='', encoding='utf-8') as feed:
+            for line_number, record in FEED_FORMATS[feed_format](feed):
+                try:
+                    menu_diff.add(record)
+                except ValueError as error:
+                    raise CommandError(f'Line {line_number}: {error}')
+
+        changed_products, changed_menu_items, new_menu_items = menu_diff.get_changes()
+        if not options['dry_run']:
+            with transaction.atomic():
+                apply_changes(changed_products, changed_menu_items, new_menu_items)
+
+        elapsed = time.perf_counter() - started_at
+        self.stdout.write(
+            f'Lines: {menu_diff.changed} changed, {menu_diff.unchanged} unchanged, '
+            f'{menu_diff.skipped} skipped. '
+            f'Updated {len(changed_products)} prices and {len(changed_menu_items)} menu items, '
+            f'inserted {len(new_menu_items)} menu items in {elapsed:.2f} s'
+        )
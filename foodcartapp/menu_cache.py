@@ -0,0 +1,115 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from star_burger.cache_versions import bump_version, get_version
+
+MENU_VERSION_KEY = 'foodcartapp:menu_version'
+MENU_CACHE_TIMEOUT = 60 * 10
+
+
+def get_menu_version():
+    return get_version(MENU_VERSION_KEY)
+
+
+def bump_menu_version():
+    bump_version(MENU_VERSION_KEY)
+
+
+def get_or_build(name, build):
+    """Return a value cached until the next menu change, building it on a miss."""
+    cache_key = f'foodcartapp:{name}:{get_menu_version()}'
+    value = cache.get(cache_key)
+    if value is None:
+        value = build()
+        cache.set(cache_key, value, timeout=MENU_CACHE_TIMEOUT)
+    return value
+
+
+def build_product_restaurants():
+    from .models import RestaurantMenuItem
+
+    restaurants_by_product = defaultdict(set)
+    menu_items = (
+        RestaurantMenuItem.objects
+        .filter(availability=True)
+        .values_list('product_id', 'restaurant_id')
+    )
+    for product_id, restaurant_id in menu_items:
+        restaurants_by_product[product_id].add(restaurant_id)
+
+    return {
+        product_id: frozenset(restaurant_ids)
+        for product_id, restaurant_ids in restaurants_by_product.items()
+    }
+
+
+def get_product_restaurants():
+    """Return {product_id: frozenset of restaurant ids} for available menu items.
+
+    The index is rebuilt with a single query after any menu change.
+    """
+    return get_or_build('product_restaurants', build_product_restaurants)
+
+
+def find_capable_restaurants(product_ids, product_restaurants):
+    """Return ids of restaurants that have every one of the products available."""
+    candidates = [
+        product_restaurants.get(product_id, frozenset())
+        for product_id in product_ids
+    ]
+    return frozenset.intersection(*candidates) if candidates else frozenset()
+
+
+def build_availability_matrix():
+    from .models import Product, Restaurant, RestaurantMenuItem
+
+    restaurants = list(Restaurant.objects.order_by('name'))
+    columns = {restaurant.id: column for column, restaurant in enumerate(restaurants)}
+    availability_bits = defaultdict(int)
+    menu_items = (
+        RestaurantMenuItem.objects
+        .filter(availability=True)
+        .values_list('product_id', 'restaurant_id')
+    )
+    for product_id, restaurant_id in menu_items:
+        availability_bits[product_id] |= 1 << columns[restaurant_id]
+
+    products = Product.objects.select_related('category')
+    return restaurants, [(product, availability_bits[product.id]) for product in products]
+
+
+def get_availability_matrix():
+    """Return (restaurants ordered by name, [(product, availability bits)]).
+
+    Bit N of a product is set when it is available in the N-th restaurant.
+    """
+    return get_or_build('availability_matrix', build_availability_matrix)
+
+
+def build_restaurant_index():
+    from geocoder.geocoder_functions import enqueue_addresses, get_existed_places
+    from geocoder.spatial_index import GridIndex
+
+    from .models import Restaurant
+
+    restaurant_addresses = dict(Restaurant.objects.values_list('id', 'address'))
+    coordinates = get_existed_places(set(restaurant_addresses.values()))
+    enqueue_addresses(set(restaurant_addresses.values()) - coordinates.keys())
+    return GridIndex({
+        restaurant_id: coordinates.get(address)
+        for restaurant_id, address in restaurant_addresses.items()
+    })
+
+
+def get_restaurant_index():
+    """Grid index of geocoded restaurants.
+
+    Rebuilt after any restaurant change or when new places get geocoded.
+    """
+    from geocoder.geocoder_functions import get_places_version
+
+    return get_or_build(
+        f'restaurant_index:{get_places_version()}',
+        build_restaurant_index,
+    )
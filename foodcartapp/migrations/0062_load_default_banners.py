@@ -0,0 +1,40 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.db import migrations
+
+DEFAULT_BANNERS = [
+    ('Burger', 'burger.jpg', 'Tasty Burger at your door step'),
+    ('Spices', 'food.jpg', 'All Cuisines'),
+    ('New York', 'tasty.jpg', 'Food is incomplete without a tasty dessert'),
+]
+
+
+def load_default_banners(apps, schema_editor):
+    Banner = apps.get_model('foodcartapp', 'Banner')
+    if Banner.objects.exists():
+        return
+    for order, (title, image_name, text) in enumerate(DEFAULT_BANNERS):
+        image_path = os.path.join(settings.BASE_DIR, 'assets', image_name)
+        if not os.path.exists(image_path):
+            continue
+        banner = Banner(title=title, text=text, order=order)
+        if banner.image.storage.exists(image_name):
+            # e.g. copied by an earlier migrate of the test database
+            banner.image.name = image_name
+        else:
+            with open(image_path, 'rb') as image_obj:
+                banner.image.save(image_name, File(image_obj), save=False)
+        banner.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0061_banner'),
+    ]
+
+    operations = [
+        migrations.RunPython(load_default_banners, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2 on 2026-10-18 17:39
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0062_load_default_banners'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('key_hash', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256 ключа идемпотентности')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Время первого запроса')),
+                ('response_status', models.PositiveSmallIntegerField(verbose_name='HTTP статус ответа')),
+                ('response_data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Ответ')),
+            ],
+            options={
+                'verbose_name': 'ключ идемпотентности',
+                'verbose_name_plural': 'ключи идемпотентности',
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2 on 2026-10-18 17:50
+
+from collections import defaultdict
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+COUNTER_FIELDS = {
+    'not_processed': 'not_processed_orders',
+    'processed': 'processed_orders',
+}
+
+
+def fill_restaurant_loads(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    Restaurant = apps.get_model('foodcartapp', 'Restaurant')
+    RestaurantLoad = apps.get_model('foodcartapp', 'RestaurantLoad')
+
+    loads = defaultdict(dict)
+    counts = (
+        Order.objects
+        .filter(restaurant__isnull=False, status__in=COUNTER_FIELDS)
+        .values('restaurant', 'status')
+        .annotate(orders_count=Count('id'))
+        .values_list('restaurant', 'status', 'orders_count')
+    )
+    for restaurant_id, status, orders_count in counts:
+        loads[restaurant_id][COUNTER_FIELDS[status]] = orders_count
+
+    RestaurantLoad.objects.bulk_create([
+        RestaurantLoad(restaurant_id=restaurant_id, **loads[restaurant_id])
+        for restaurant_id in Restaurant.objects.values_list('id', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0065_order_total_cost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantLoad',
+            fields=[
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='load', serialize=False, to='foodcartapp.restaurant', verbose_name='ресторан')),
+                ('not_processed_orders', models.IntegerField(default=0, verbose_name='необработанных заказов')),
+                ('processed_orders', models.IntegerField(default=0, verbose_name='заказов в работе')),
+            ],
+            options={
+                'verbose_name': 'загрузка ресторана',
+                'verbose_name_plural': 'загрузка ресторанов',
+            },
+        ),
+        migrations.RunPython(fill_restaurant_loads, migrations.RunPython.noop),
+    ]
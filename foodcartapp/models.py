@@ -1,10 +1,16 @@
 from collections import defaultdict
 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import F, Sum
+from django.db import models, transaction
+from django.db.models import (Count, DecimalField, F, OuterRef, Subquery,
+                              Sum, Value)
+from django.db.models.functions import Coalesce
 from phonenumber_field.modelfields import PhoneNumberField
 
+from .menu_cache import (bump_menu_version, find_capable_restaurants,
+                         get_product_restaurants)
+
 
 class Restaurant(models.Model):
     name = models.CharField(
@@ -97,6 +103,19 @@ class Product(models.Model):
         return self.name
 
 
+class RestaurantMenuItemQuerySet(models.QuerySet):
+    def set_availability(self, availability):
+        """Update all menu items with one statement and bump the menu version once.
+
+        QuerySet.update() skips post_save signals, so caches are not
+        invalidated per row.
+        """
+        updated = self.exclude(availability=availability).update(availability=availability)
+        if updated:
+            transaction.on_commit(bump_menu_version)
+        return updated
+
+
 class RestaurantMenuItem(models.Model):
     restaurant = models.ForeignKey(
         Restaurant,
@@ -116,6 +135,8 @@ class RestaurantMenuItem(models.Model):
         db_index=True
     )
 
+    objects = RestaurantMenuItemQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'пункт меню ресторана'
         verbose_name_plural = 'пункты меню ресторана'
@@ -163,23 +184,43 @@ class OrderItem(models.Model):
 
 
 class OrderQuerySet(models.QuerySet):
-    def calculate_total_cost(self):
-        return self.annotate(
-            total_cost=Sum(F('order_items__price') * F('order_items__quantity')))
+    def annotate_items_cost(self):
+        return self.annotate(items_cost=Coalesce(
+            Sum(F('order_items__price') * F('order_items__quantity')),
+            Value(0),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ))
+
+    def update_total_cost(self):
+        items_cost = (
+            OrderItem.objects
+            .filter(order=OuterRef('pk'))
+            .values('order')
+            .annotate(cost=Sum(F('price') * F('quantity')))
+            .values('cost')
+        )
+        return self.update(total_cost=Coalesce(
+            Subquery(items_cost),
+            Value(0),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ))
 
     def join_restaurants(self):
-        """WARNING: evaluate queryset."""
+        """WARNING: evaluate queryset.
+
+        Expects `order_items` to be prefetched.
+        """
+        product_restaurants = get_product_restaurants()
+        restaurants = Restaurant.objects.in_bulk()
         for order in self:
-            order_items = order.order_items.all()
-            product_amount = len(order_items)
-            restaurants = defaultdict(int)
-            for order_item in order_items:
-                for menu_item in order_item.product.menu_items.all():
-                    restaurants[menu_item.restaurant] += 1
+            restaurant_ids = find_capable_restaurants(
+                [order_item.product_id for order_item in order.order_items.all()],
+                product_restaurants,
+            )
             order.available_restaurants = [
-                restaurant
-                for restaurant, count in restaurants.items()
-                if count == product_amount
+                restaurants[restaurant_id]
+                for restaurant_id in sorted(restaurant_ids)
+                if restaurant_id in restaurants
             ]
         return self
 
@@ -230,6 +271,14 @@ class Order(models.Model):
         db_index=True,
     )
     comment = models.TextField('Комментарий к заказу', blank=True)
+    total_cost = models.DecimalField(
+        'Стоимость заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        db_index=True,
+        validators=[MinValueValidator(0)],
+    )
 
     restaurant = models.ForeignKey(
         Restaurant,
@@ -246,6 +295,132 @@ class Order(models.Model):
     class Meta:
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
 
     def __str__(self):
         return f'Заказ №{self.id}'
+
+
+class RestaurantLoadQuerySet(models.QuerySet):
+    def apply_changes(self, changes):
+        """Add deltas to the counters.
+
+        `changes` is {(restaurant_id, order status): delta}, statuses
+        without a counter and orders without a restaurant are ignored.
+        """
+        deltas = defaultdict(dict)
+        for (restaurant_id, status), delta in changes.items():
+            field = RestaurantLoad.COUNTER_FIELDS.get(status)
+            if restaurant_id and field and delta:
+                deltas[restaurant_id][field] = deltas[restaurant_id].get(field, 0) + delta
+        if not deltas:
+            return
+
+        self.bulk_create(
+            [RestaurantLoad(restaurant_id=restaurant_id) for restaurant_id in deltas],
+            ignore_conflicts=True,
+        )
+        for restaurant_id, field_deltas in deltas.items():
+            self.filter(restaurant_id=restaurant_id).update(**{
+                field: F(field) + delta
+                for field, delta in field_deltas.items()
+            })
+
+    def recompute(self):
+        """Rebuild all counters from the orders table."""
+        loads = defaultdict(dict)
+        counts = (
+            Order.objects
+            .filter(restaurant__isnull=False, status__in=RestaurantLoad.COUNTER_FIELDS)
+            .values('restaurant', 'status')
+            .annotate(orders_count=Count('id'))
+            .values_list('restaurant', 'status', 'orders_count')
+        )
+        for restaurant_id, status, orders_count in counts:
+            loads[restaurant_id][RestaurantLoad.COUNTER_FIELDS[status]] = orders_count
+
+        restaurant_loads = [
+            RestaurantLoad(restaurant_id=restaurant_id, **loads[restaurant_id])
+            for restaurant_id in Restaurant.objects.values_list('id', flat=True)
+        ]
+        self.all().delete()
+        self.bulk_create(restaurant_loads)
+        return restaurant_loads
+
+
+class RestaurantLoad(models.Model):
+    COUNTER_FIELDS = {
+        Order.OrderStatus.NOT_PROCESSED: 'not_processed_orders',
+        Order.OrderStatus.PROCESSED: 'processed_orders',
+    }
+
+    restaurant = models.OneToOneField(
+        Restaurant,
+        verbose_name='ресторан',
+        related_name='load',
+        primary_key=True,
+        on_delete=models.CASCADE,
+    )
+    not_processed_orders = models.IntegerField('необработанных заказов', default=0)
+    processed_orders = models.IntegerField('заказов в работе', default=0)
+
+    objects = RestaurantLoadQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'загрузка ресторана'
+        verbose_name_plural = 'загрузка ресторанов'
+
+    def __str__(self):
+        return f'{self.restaurant.name}: {self.open_orders}'
+
+    @property
+    def open_orders(self):
+        return self.not_processed_orders + self.processed_orders
+
+
+class Banner(models.Model):
+    title = models.CharField('заголовок', max_length=50)
+    image = models.ImageField('картинка')
+    text = models.CharField('текст', max_length=200, blank=True)
+    order = models.PositiveIntegerField(
+        'порядок',
+        default=0,
+        db_index=True,
+    )
+    is_active = models.BooleanField(
+        'показывать',
+        default=True,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'баннер'
+        verbose_name_plural = 'баннеры'
+        ordering = ['order', 'id']
+
+    def __str__(self):
+        return self.title
+
+
+class IdempotencyKey(models.Model):
+    key_hash = models.CharField(
+        'SHA-256 ключа идемпотентности',
+        max_length=64,
+        primary_key=True,
+    )
+    created_at = models.DateTimeField(
+        'Время первого запроса',
+        auto_now_add=True,
+        db_index=True,
+    )
+    response_status = models.PositiveSmallIntegerField('HTTP статус ответа')
+    response_data = models.JSONField('Ответ', encoder=DjangoJSONEncoder)
+
+    class Meta:
+        verbose_name = 'ключ идемпотентности'
+        verbose_name_plural = 'ключи идемпотентности'
+
+    def __str__(self):
+        return self.key_hash
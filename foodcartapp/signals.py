@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from geocoder.geocoder_functions import enqueue_addresses
+
+from .banners import bump_banners_version
+from .menu_cache import bump_menu_version
+from .models import (Banner, Order, OrderItem, Product, ProductCategory,
+                     Restaurant, RestaurantLoad, RestaurantMenuItem)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def invalidate_menu_cache(sender, **kwargs):
+    transaction.on_commit(bump_menu_version)
+
+
+@receiver(post_save, sender=Restaurant)
+def geocode_restaurant_address(sender, instance, **kwargs):
+    enqueue_addresses([instance.address])
+
+
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+def invalidate_banners_cache(sender, **kwargs):
+    transaction.on_commit(bump_banners_version)
+
+
+@receiver(post_save, sender=Restaurant)
+def create_restaurant_load(sender, instance, created, **kwargs):
+    if created:
+        RestaurantLoad.objects.get_or_create(restaurant=instance)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_load_key(sender, instance, **kwargs):
+    instance.previous_load_key = (
+        Order.objects
+        .filter(pk=instance.pk)
+        .values_list('restaurant_id', 'status')
+        .first()
+    ) if instance.pk else None
+
+
+@receiver(post_save, sender=Order)
+def update_restaurant_load(sender, instance, **kwargs):
+    current_load_key = (instance.restaurant_id, instance.status)
+    previous_load_key = getattr(instance, 'previous_load_key', None)
+    if current_load_key == previous_load_key:
+        return
+    changes = {current_load_key: 1}
+    if previous_load_key:
+        changes[previous_load_key] = -1
+    RestaurantLoad.objects.apply_changes(changes)
+
+
+@receiver(post_delete, sender=Order)
+def release_restaurant_load(sender, instance, **kwargs):
+    RestaurantLoad.objects.apply_changes({
+        (instance.restaurant_id, instance.status): -1,
+    })
+
+
+@receiver(pre_save, sender=OrderItem)
+def remember_order_item_order(sender, instance, **kwargs):
+    instance.previous_order_id = (
+        OrderItem.objects
+        .filter(pk=instance.pk)
+        .values_list('order_id', flat=True)
+        .first()
+    ) if instance.pk else None
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_total_cost(sender, instance, **kwargs):
+    """Keep Order.total_cost in sync with items changed in any way but bulk ones."""
+    order_ids = {instance.order_id, getattr(instance, 'previous_order_id', None)} - {None}
+    Order.objects.filter(pk__in=order_ids).update_total_cost()
@@ -1,38 +1,43 @@
-from django.db import transaction
-from django.http import JsonResponse
-from django.templatetags.static import static
-from rest_framework.decorators import api_view
+import hashlib
+import json
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils.http import quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import (BooleanField, IntegerField, ListField,
+                                        ModelSerializer,
+                                        PrimaryKeyRelatedField, Serializer)
+
+from geocoder.geocoder_functions import enqueue_addresses
 
-from .models import Order, OrderItem, Product
+from .assignment import assign_restaurants
+from .banners import get_banners_payload
+from .menu_cache import get_or_build
+from .models import (IdempotencyKey, Order, OrderItem, Product,
+                     RestaurantMenuItem)
 
+MAX_BULK_ORDERS = 1000
+MAX_MENU_ITEMS = 10000
 
+
+@cache_control(public=True, max_age=300)
 def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
-        {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return HttpResponse(get_banners_payload(), content_type='application/json')
 
 
-def product_list_api(request):
+def build_products_payload():
     products = Product.objects.select_related('category').available()
 
     dumped_products = []
@@ -54,13 +59,75 @@ def product_list_api(request):
             }
         }
         dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+
+    content = json.dumps(
+        dumped_products,
+        cls=DjangoJSONEncoder,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode()
+    etag = quote_etag(hashlib.md5(content).hexdigest())
+    return etag, content
+
+
+def get_products_payload():
+    return get_or_build('products_payload', build_products_payload)
+
+
+def get_products_etag(request):
+    etag, _ = get_products_payload()
+    return etag
+
+
+@condition(etag_func=get_products_etag)
+def product_list_api(request):
+    _, content = get_products_payload()
+    return HttpResponse(content, content_type='application/json')
+
+
+def parse_product_id(data):
+    if isinstance(data, bool):
+        raise TypeError
+    return int(data)
+
+
+def get_ordered_product_prices(orders_data):
+    """Read {product_id: price} of every product in raw orders with one query."""
+    product_ids = set()
+    for order_data in orders_data:
+        order_items = order_data.get('products') if isinstance(order_data, dict) else None
+        if not isinstance(order_items, list):
+            continue
+        for order_item in order_items:
+            if not isinstance(order_item, dict):
+                continue
+            try:
+                product_ids.add(parse_product_id(order_item.get('product')))
+            except (TypeError, ValueError):
+                continue
+    return dict(Product.objects.filter(id__in=product_ids).values_list('id', 'price'))
+
+
+class PricedProductField(PrimaryKeyRelatedField):
+    """Resolve products from the `product_prices` context, not with a query per item."""
+
+    def to_internal_value(self, data):
+        try:
+            product_id = parse_product_id(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+        product_prices = self.context.get('product_prices')
+        if product_prices is None:
+            product_prices = dict(Product.objects.filter(id=product_id).values_list('id', 'price'))
+        if product_id not in product_prices:
+            self.fail('does_not_exist', pk_value=data)
+        return Product(id=product_id, price=product_prices[product_id])
 
 
 class OrderItemsSerializer(ModelSerializer):
+    product = PricedProductField(queryset=Product.objects.all())
+
     class Meta:
         model = OrderItem
         fields = ['product', 'quantity']
@@ -82,19 +149,31 @@ class OrderSerializer(ModelSerializer):
         read_only_fields = ('id', )
 
 
-@transaction.atomic
-@api_view(['POST'])
-def register_order(request):
-    serializer = OrderSerializer(data=request.data)
-    serializer.is_valid(raise_exception=True)
-    order = Order.objects.create(
-        firstname=serializer.validated_data['firstname'],
-        lastname=serializer.validated_data['lastname'],
-        address=serializer.validated_data['address'],
-        phonenumber=serializer.validated_data['phonenumber'],
-    )
+def create_orders(validated_orders):
+    """Insert orders and all their items with two bulk inserts.
+
+    Databases that can't return ids from a bulk insert (SQLite on this
+    Django version) get the orders inserted one by one instead.
+    """
+    orders = [
+        Order(
+            firstname=order_data['firstname'],
+            lastname=order_data['lastname'],
+            address=order_data['address'],
+            phonenumber=order_data['phonenumber'],
+            total_cost=sum(
+                order_item['product'].price * order_item['quantity']
+                for order_item in order_data['order_items']
+            ),
+        )
+        for order_data in validated_orders
+    ]
+    if connection.features.can_return_rows_from_bulk_insert:
+        Order.objects.bulk_create(orders)
+    else:
+        for order in orders:
+            order.save()
 
-    order_items = serializer.validated_data['order_items']
     order_items = [
         OrderItem(
             order=order,
@@ -102,9 +181,151 @@ def register_order(request):
             quantity=order_item['quantity'],
             price=order_item['product'].price,
         )
-        for order_item in order_items
+        for order, order_data in zip(orders, validated_orders)
+        for order_item in order_data['order_items']
     ]
     OrderItem.objects.bulk_create(order_items)
+    enqueue_addresses([order.address for order in orders])
+
+    if settings.AUTO_ASSIGN_RESTAURANTS:
+        product_ids_by_order = defaultdict(list)
+        for order_item in order_items:
+            product_ids_by_order[order_item.order.id].append(order_item.product.id)
+        assign_restaurants(orders, product_ids_by_order)
+    return orders
 
-    order_serializer = OrderSerializer(order)
-    return Response(order_serializer.data)
+
+def get_saved_response(key_hash):
+    saved_response = IdempotencyKey.objects.filter(key_hash=key_hash).first()
+    if not saved_response:
+        return None
+    return Response(saved_response.response_data, status=saved_response.response_status)
+
+
+@api_view(['POST'])
+def register_order(request):
+    """Create an order.
+
+    A request with an `Idempotency-Key` header that was already seen gets
+    the original response back, so client retries don't duplicate orders.
+    """
+    idempotency_key = request.headers.get('Idempotency-Key')
+    key_hash = None
+    if idempotency_key:
+        key_hash = hashlib.sha256(idempotency_key.encode()).hexdigest()
+        saved_response = get_saved_response(key_hash)
+        if saved_response:
+            return saved_response
+
+    try:
+        with transaction.atomic():
+            serializer = OrderSerializer(
+                data=request.data,
+                context={'product_prices': get_ordered_product_prices([request.data])},
+            )
+            serializer.is_valid(raise_exception=True)
+            order, = create_orders([serializer.validated_data])
+
+            order_data = OrderSerializer(order).data
+            if key_hash:
+                IdempotencyKey.objects.create(
+                    key_hash=key_hash,
+                    response_status=200,
+                    response_data=order_data,
+                )
+    except IntegrityError:
+        saved_response = key_hash and get_saved_response(key_hash)
+        if not saved_response:
+            raise
+        return saved_response
+
+    return Response(order_data)
+
+
+@api_view(['POST'])
+def register_orders_bulk(request):
+    if not isinstance(request.data, list) or not request.data:
+        raise ValidationError({'non_field_errors': ['Ожидался непустой список заказов.']})
+    if len(request.data) > MAX_BULK_ORDERS:
+        raise ValidationError({
+            'non_field_errors': [f'Не больше {MAX_BULK_ORDERS} заказов за запрос.']
+        })
+
+    product_prices = get_ordered_product_prices(request.data)
+    serializers = [
+        OrderSerializer(data=order_data, context={'product_prices': product_prices})
+        for order_data in request.data
+    ]
+    valid_serializers = [
+        serializer for serializer in serializers if serializer.is_valid()
+    ]
+    with transaction.atomic():
+        orders = iter(create_orders([
+            serializer.validated_data for serializer in valid_serializers
+        ]))
+
+    results = []
+    for serializer in serializers:
+        if serializer.errors:
+            results.append({'status': 'error', 'errors': serializer.errors})
+        else:
+            results.append({'status': 'created', 'id': next(orders).id})
+    return Response(results)
+
+
+class MenuItemKeySerializer(Serializer):
+    restaurant = IntegerField()
+    product = IntegerField()
+
+
+class MenuAvailabilitySerializer(Serializer):
+    availability = BooleanField()
+    restaurants = ListField(child=IntegerField(), required=False)
+    products = ListField(child=IntegerField(), required=False)
+    categories = ListField(child=IntegerField(), required=False)
+    items = ListField(
+        child=MenuItemKeySerializer(),
+        required=False,
+        max_length=MAX_MENU_ITEMS,
+    )
+
+    def validate(self, data):
+        if not any(data.get(field) for field in ['restaurants', 'products', 'categories', 'items']):
+            raise ValidationError('Укажите restaurants, products, categories или items.')
+        return data
+
+
+def filter_menu_items(menu_items, selection):
+    """Narrow menu items down by the fields of MenuAvailabilitySerializer."""
+    if selection.get('restaurants'):
+        menu_items = menu_items.filter(restaurant__in=selection['restaurants'])
+    if selection.get('products'):
+        menu_items = menu_items.filter(product__in=selection['products'])
+    if selection.get('categories'):
+        menu_items = menu_items.filter(product__category__in=selection['categories'])
+    if selection.get('items'):
+        products_by_restaurant = defaultdict(set)
+        for item in selection['items']:
+            products_by_restaurant[item['restaurant']].add(item['product'])
+        menu_items = menu_items.filter(reduce(or_, (
+            Q(restaurant=restaurant_id, product__in=product_ids)
+            for restaurant_id, product_ids in products_by_restaurant.items()
+        )))
+    return menu_items
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def update_menu_availability(request):
+    """Switch availability of many menu items with a single UPDATE.
+
+    Filters are combined with AND, `items` lists exact (restaurant,
+    product) pairs. E.g. {"restaurants": [1], "categories": [2],
+    "availability": false} takes all burgers of restaurant 1 off sale.
+    """
+    serializer = MenuAvailabilitySerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    menu_items = filter_menu_items(RestaurantMenuItem.objects.all(), serializer.validated_data)
+    with transaction.atomic():
+        updated = menu_items.set_availability(serializer.validated_data['availability'])
+    return Response({'updated': updated})
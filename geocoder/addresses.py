@@ -0,0 +1,52 @@
+import re
+
+ABBREVIATIONS = {
+    'ул': 'улица',
+    'пр': 'проспект',
+    'пр-т': 'проспект',
+    'пр-кт': 'проспект',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'ш': 'шоссе',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'туп': 'тупик',
+    'мкр': 'микрорайон',
+    'мкрн': 'микрорайон',
+    'г': 'город',
+    'обл': 'область',
+    'р-н': 'район',
+    'пос': 'поселок',
+    'к': 'корпус',
+    'корп': 'корпус',
+    'стр': 'строение',
+    'кв': 'квартира',
+}
+HOUSE_WORDS = {'д', 'дом'}
+
+PUNCTUATION_RE = re.compile(r'[^\w\s/-]')
+SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_address(address):
+    """Reduce spelling variants of an address to one cache key.
+
+    "ул. Ленина, д. 5", "улица  Ленина 5" and "Улица Ленина, 5 " all become
+    "улица ленина 5".
+    """
+    address = address.lower().replace('ё', 'е')
+    address = PUNCTUATION_RE.sub(' ', address)
+    tokens = SPACES_RE.split(address.strip())
+
+    normalized_tokens = []
+    for index, token in enumerate(tokens):
+        token = token.strip('-')
+        if not token:
+            continue
+        next_token = tokens[index + 1] if index + 1 < len(tokens) else ''
+        if token in HOUSE_WORDS and next_token[:1].isdigit():
+            continue
+        normalized_tokens.append(ABBREVIATIONS.get(token, token))
+    return ' '.join(normalized_tokens) or address
@@ -1,11 +1,18 @@
 from django.contrib import admin
 
-from .models import Place
+from .models import GeocodingTask, Place
 
 
 @admin.register(Place)
 class PlaceAdmin(admin.ModelAdmin):
     list_display = ('address', 'latitude', 'longitude', 'fetch_coordinates_at')
-    readonly_fields = ('fetch_coordinates_at',)
+    readonly_fields = ('normalized_address', 'fetch_coordinates_at')
+    search_fields = ('address', 'normalized_address')
+
+
+@admin.register(GeocodingTask)
+class GeocodingTaskAdmin(admin.ModelAdmin):
+    list_display = ('address', 'created_at', 'attempts', 'next_attempt_at')
+    readonly_fields = ('created_at',)
 
 # Register your models here.
@@ -0,0 +1,54 @@
+import numpy as np
+from geopy import distance
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_lonlat_array(coordinates):
+    """Convert (lon, lat) pairs into a float array, unknown ones become NaN."""
+    lonlat_array = np.full((len(coordinates), 2), np.nan)
+    for index, lonlat in enumerate(coordinates):
+        if not lonlat or None in lonlat:
+            continue
+        lon, lat = lonlat
+        lonlat_array[index] = float(lon), float(lat)
+    return lonlat_array
+
+
+def haversine_matrix(origins, destinations):
+    origins = np.radians(origins)
+    destinations = np.radians(destinations)
+    lon_from, lat_from = origins[:, np.newaxis, 0], origins[:, np.newaxis, 1]
+    lon_to, lat_to = destinations[np.newaxis, :, 0], destinations[np.newaxis, :, 1]
+
+    haversine = (
+        np.sin((lat_to - lat_from) / 2) ** 2
+        + np.cos(lat_from) * np.cos(lat_to) * np.sin((lon_to - lon_from) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(haversine, 0, 1)))
+
+
+def geodesic_matrix(origins, destinations):
+    matrix = np.full((len(origins), len(destinations)), np.nan)
+    for row, (lon_from, lat_from) in enumerate(origins):
+        if np.isnan(lon_from):
+            continue
+        for column, (lon_to, lat_to) in enumerate(destinations):
+            if np.isnan(lon_to):
+                continue
+            matrix[row, column] = distance.distance((lat_from, lon_from), (lat_to, lon_to)).km
+    return matrix
+
+
+def distance_matrix(origins, destinations, exact=False):
+    """Return distances in km between every origin and every destination.
+
+    Both arguments are sequences of (lon, lat) pairs, unknown coordinates
+    may be None and give NaN. Haversine is used unless `exact` is set,
+    then every pair is computed with geopy geodesic.
+    """
+    origins = to_lonlat_array(origins)
+    destinations = to_lonlat_array(destinations)
+    if exact:
+        return geodesic_matrix(origins, destinations)
+    return haversine_matrix(origins, destinations)
@@ -1,16 +1,169 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+
 import requests
-from geopy import distance
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from geocoder.addresses import normalize_address
+from geocoder.lru_cache import LRUCache
+from geocoder.models import GeocodingTask, Place
+from star_burger.cache_versions import bump_version, get_version
+
+logger = logging.getLogger(__name__)
+
+PLACES_VERSION_KEY = 'geocoder:places_version'
+
+places_cache = LRUCache(settings.GEOCODER_LRU_SIZE, ttl=settings.GEOCODER_LRU_TTL)
+
+
+def get_places_version():
+    return get_version(PLACES_VERSION_KEY)
+
+
+def bump_places_version():
+    bump_version(PLACES_VERSION_KEY)
+
+
+class RateLimiter:
+    """Let no more than GEOCODER_RATE_LIMIT calls start per second.
+
+    Time is cut into slots of 1 / rate seconds and every call claims the
+    first free slot in the cache. With memcached as CACHE_URL the limit
+    holds for all processes together, with `locmem://` only per process.
+    """
+
+    def __init__(self, key):
+        self.key = key
+
+    def wait(self):
+        rate = settings.GEOCODER_RATE_LIMIT
+        if not rate:
+            return
+        slot = int(time.time() * rate)
+        while True:
+            delay = max(0, slot / rate - time.time())
+            if cache.add(f'{self.key}:{slot}', 1, timeout=int(delay) + 2):
+                break
+            slot += 1
+        time.sleep(max(0, slot / rate - time.time()))
+
+
+class SingleFlight:
+    """Share one call between threads asking for the same key at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, func):
+        with self.lock:
+            future = self.calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self.calls[key] = Future()
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+
+inflight_requests = SingleFlight()
+rate_limiter = RateLimiter('geocoder:rate')
+
+
+def get_lease_key(normalized_address):
+    address_hash = hashlib.md5(normalized_address.encode()).hexdigest()
+    return f'geocoder:lease:{address_hash}'
+
+
+def estimate_fetch_duration(addresses_count):
+    """Upper estimate of how long geocoding that many addresses takes, in seconds."""
+    rate_limit = settings.GEOCODER_RATE_LIMIT
+    spacing = addresses_count / rate_limit if rate_limit else 0
+    return spacing + settings.GEOCODER_TIMEOUT * 2
+
+
+def acquire_leases(normalized_addresses):
+    """Mark addresses as being geocoded, return the ones nobody else is fetching.
+
+    Leases live in the cache, so with memcached they work across processes. They
+    last as long as the whole batch may take, and are released earlier
+    once its results are saved.
+    """
+    normalized_addresses = list(normalized_addresses)
+    timeout = estimate_fetch_duration(len(normalized_addresses))
+    return {
+        normalized_address
+        for normalized_address in normalized_addresses
+        if cache.add(get_lease_key(normalized_address), 1, timeout=timeout)
+    }
+
+
+def release_leases(normalized_addresses):
+    cache.delete_many([
+        get_lease_key(normalized_address)
+        for normalized_address in normalized_addresses
+    ])
+
+
+def wait_for_places(addresses, stale_at):
+    """Poll Place for addresses another process is geocoding right now.
+
+    Stops when the other process releases its leases or after
+    GEOCODER_TIMEOUT. Addresses not found by then are left out for the
+    caller to retry later.
+    """
+    found_places = {}
+    deadline = time.monotonic() + settings.GEOCODER_TIMEOUT
+    while True:
+        waited_addresses = addresses - found_places.keys()
+        found_places.update(
+            (address, place)
+            for address, place in get_places_by_addresses(waited_addresses).items()
+            if not place.is_expired(stale_at)
+        )
+        waited_addresses = addresses - found_places.keys()
+        lease_keys = [get_lease_key(normalize_address(address)) for address in waited_addresses]
+        if not cache.get_many(lease_keys) or time.monotonic() > deadline:
+            return found_places
+        time.sleep(0.2)
 
-from geocoder.models import Place
 
+def create_session(pool_size=None):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size or settings.GEOCODER_MAX_WORKERS,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
 
-def fetch_coordinates(apikey, address):
-    base_url = "https://geocode-maps.yandex.ru/1.x"
-    response = requests.get(base_url, params={
+
+def fetch_coordinates(apikey, address, session=None, timeout=None):
+    session = session or requests
+    response = session.get(settings.GEOCODER_URL, params={
         "geocode": address,
         "apikey": apikey,
         "format": "json",
-    })
+    }, timeout=timeout or settings.GEOCODER_TIMEOUT)
     response.raise_for_status()
     found_places = response.json()['response']['GeoObjectCollection']['featureMember']
 
@@ -19,49 +172,222 @@ def fetch_coordinates(apikey, address):
 
     most_relevant = found_places[0]
     lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
-    return lon, lat
+    return float(lon), float(lat)
 
 
-def calculate_distance(lonlat_coords_from, lonlat_coords_to):
-    if not lonlat_coords_from or not lonlat_coords_to:
-        return None
-    lon_from, lat_from = lonlat_coords_from
-    lon_to, lat_to = lonlat_coords_to
-    dist = distance.distance((lat_from, lon_from), (lat_to, lon_to)).km
-    return dist
+def fetch_coordinates_concurrently(addresses, apikey, session=None, max_workers=None):
+    """Geocode addresses in a thread pool sharing one HTTP session.
+
+    Returns {address: (lon, lat) or None}. Addresses whose request failed
+    are left out, so they are retried on the next call.
+    """
+    addresses = list(addresses)
+    if not addresses:
+        return {}
+
+    max_workers = min(max_workers or settings.GEOCODER_MAX_WORKERS, len(addresses))
+    own_session = session is None
+    if own_session:
+        session = create_session(max_workers)
+
+    def fetch(address):
+        def request_geocoder():
+            rate_limiter.wait()
+            return fetch_coordinates(apikey, address, session=session)
+        return inflight_requests.do(normalize_address(address), request_geocoder)
+
+    fetched_coordinates = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                address: executor.submit(fetch, address)
+                for address in addresses
+            }
+            for address, future in futures.items():
+                try:
+                    fetched_coordinates[address] = future.result()
+                except (requests.RequestException, KeyError, ValueError):
+                    logger.exception('Failed to geocode address %r', address)
+    finally:
+        if own_session:
+            session.close()
+    return fetched_coordinates
+
+
+def get_places_by_addresses(addresses):
+    """Return {address: Place} matching addresses by their normalized form."""
+    addresses_by_key = defaultdict(list)
+    for address in addresses:
+        addresses_by_key[normalize_address(address)].append(address)
+
+    places = (
+        Place.objects
+        .filter(normalized_address__in=addresses_by_key)
+        .order_by('fetch_coordinates_at')
+    )
+    places_by_address = {}
+    for place in places:
+        for address in addresses_by_key[place.normalized_address]:
+            places_by_address[address] = place
+    return places_by_address
 
 
 def get_existed_places(addresses):
-    existed_places = Place.objects.filter(address__in=addresses)
-    return {
-        place.address: (place.longitude, place.latitude)
-        for place in existed_places
-    }
+    """Return {address: (lon, lat) or None} of already geocoded addresses.
+
+    None means the geocoder found nothing. Expired entries are still
+    returned, but get queued for a background refresh. Lookups go through
+    a process-local LRU which is dropped whenever Place rows change. Only
+    found places are kept there: an address without a Place row is looked
+    up in the DB every time, as the geocode_worker may add it any moment.
+    """
+    now = timezone.now()
+    addresses = set(addresses)
+    places_cache.sync_version(get_places_version())
+    cached_places = places_cache.get_many(addresses)
+
+    missing_addresses = addresses - cached_places.keys()
+    if missing_addresses:
+        found_places = get_places_by_addresses(missing_addresses)
+        new_entries = {
+            address: (place.address, place.coordinates, place.expires_at)
+            for address, place in found_places.items()
+        }
+        places_cache.set_many(new_entries)
+        cached_places.update(new_entries)
+
+    known_coordinates = {}
+    expired_entries = {}
+    for address, cached_place in cached_places.items():
+        place_address, coordinates, expires_at = cached_place
+        known_coordinates[address] = coordinates
+        if expires_at and expires_at < now:
+            # Refresh is queued, don't queue it again on every lookup
+            expired_entries[address] = (place_address, coordinates, None)
+
+    if expired_entries:
+        enqueue_addresses(place_address for place_address, _, _ in expired_entries.values())
+        places_cache.set_many(expired_entries)
+    return known_coordinates
+
 
+def get_places_cache_stats():
+    return places_cache.get_stats()
 
-def fetch_coordinates_by_addresses(addresses, apikey):
-    unique_addresses = list(set(addresses))
-    known_coordinates = get_existed_places(unique_addresses)
 
-    if len(unique_addresses) == len(known_coordinates):
+def fetch_coordinates_by_addresses(addresses, apikey, session=None, stale_at=None):
+    """Geocode addresses which are not cached or whose cache entry expired.
+
+    Entries that will be expired at `stale_at` are refreshed too, it
+    defaults to now. Addresses with the same normalized form share one
+    request and one cache entry. Addresses that another process is already
+    geocoding are never requested twice: they are waited for after our own
+    ones, and left out if they don't show up. Returns
+    {address: (lon, lat) or None}, addresses which failed to geocode are
+    left out.
+    """
+    now = timezone.now()
+    stale_at = stale_at or now
+    places = get_places_by_addresses(set(addresses))
+    known_coordinates = {
+        address: place.coordinates
+        for address, place in places.items()
+        if not place.is_expired(stale_at)
+    }
+
+    missing_addresses = defaultdict(list)
+    for address in set(addresses) - known_coordinates.keys():
+        missing_addresses[normalize_address(address)].append(address)
+    if not missing_addresses:
         return known_coordinates
 
+    leased_addresses = acquire_leases(missing_addresses)
+    busy_addresses = {
+        normalized_address: missing_addresses.pop(normalized_address)
+        for normalized_address in missing_addresses.keys() - leased_addresses
+    }
+
+    try:
+        fetched_coordinates = fetch_coordinates_concurrently(
+            [same_addresses[0] for same_addresses in missing_addresses.values()],
+            apikey,
+            session=session,
+        )
+        save_fetched_coordinates(missing_addresses, fetched_coordinates, places, now)
+    finally:
+        # Other processes poll Place, so let them go only once it is committed.
+        transaction.on_commit(lambda: release_leases(leased_addresses))
+
+    for same_addresses in missing_addresses.values():
+        address = same_addresses[0]
+        if address in fetched_coordinates:
+            for same_address in same_addresses:
+                known_coordinates[same_address] = fetched_coordinates[address]
+
+    if busy_addresses:
+        waited_places = wait_for_places(
+            {same_addresses[0] for same_addresses in busy_addresses.values()},
+            stale_at,
+        )
+        for address, place in waited_places.items():
+            for same_address in busy_addresses[normalize_address(address)]:
+                known_coordinates[same_address] = place.coordinates
+    return known_coordinates
+
+
+def save_fetched_coordinates(missing_addresses, fetched_coordinates, places, now):
     new_places = []
-    for address in addresses:
-        if known_coordinates.get(address, None):
+    refreshed_places = {}
+    for normalized_address, same_addresses in missing_addresses.items():
+        address = same_addresses[0]
+        if address not in fetched_coordinates:
             continue
-
-        known_coordinates[address] = fetch_coordinates(apikey, address)
-        if not known_coordinates[address]:
-            new_places.append(Place(address=address))
+        lon, lat = fetched_coordinates[address] or (None, None)
+        if address not in places:
+            new_places.append(Place(
+                address=address,
+                normalized_address=normalized_address,
+                longitude=lon,
+                latitude=lat,
+            ))
             continue
 
-        lon, lat = known_coordinates[address]
-        new_places.append(Place(
-            address=address,
-            longitude=lon,
-            latitude=lat,
-        ))
-    if any(new_places):
-        Place.objects.bulk_create(new_places)
-    return known_coordinates
+        place = places[address]
+        place.longitude = lon
+        place.latitude = lat
+        place.fetch_coordinates_at = now
+        refreshed_places[place.pk] = place
+
+    if not new_places and not refreshed_places:
+        return
+    with transaction.atomic():
+        Place.objects.bulk_create(new_places, ignore_conflicts=True)
+        Place.objects.bulk_update(
+            refreshed_places.values(),
+            ['longitude', 'latitude', 'fetch_coordinates_at'],
+        )
+        transaction.on_commit(bump_places_version)
+
+
+def enqueue_addresses(addresses):
+    """Put addresses into the queue processed by the geocode_worker command.
+
+    Tasks which ran out of attempts get a fresh set once their last backoff
+    is over.
+    """
+    addresses = {address for address in addresses if address}
+    if not addresses:
+        return
+    GeocodingTask.objects.bulk_create(
+        [GeocodingTask(address=address) for address in addresses],
+        ignore_conflicts=True,
+    )
+    (
+        GeocodingTask.objects
+        .filter(
+            address__in=addresses,
+            attempts__gte=settings.GEOCODER_MAX_ATTEMPTS,
+            next_attempt_at__lte=timezone.now(),
+        )
+        .update(attempts=0)
+    )
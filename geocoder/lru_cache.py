@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe bounded mapping, dropped as a whole when the version changes.
+
+    Entries also live no longer than `ttl` seconds, so a version bump that
+    never reached this process (e.g. under `locmem://`) is only
+    missed for a while.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def sync_version(self, version):
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+
+    def get_many(self, keys):
+        found = {}
+        now = time.monotonic()
+        with self.lock:
+            for key in keys:
+                expires_at, value = self.entries.get(key, (None, None))
+                if expires_at is None or (self.ttl and expires_at < now):
+                    self.entries.pop(key, None)
+                    self.misses += 1
+                    continue
+                self.entries.move_to_end(key)
+                found[key] = value
+                self.hits += 1
+        return found
+
+    def set_many(self, mapping):
+        expires_at = time.monotonic() + (self.ttl or 0)
+        with self.lock:
+            for key, value in mapping.items():
+                self.entries[key] = (expires_at, value)
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def get_stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else None,
+                'version': self.version,
+            }
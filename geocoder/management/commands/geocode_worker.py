@@ -0,0 +1,90 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from geocoder.geocoder_functions import (estimate_fetch_duration,
+                                         fetch_coordinates_by_addresses)
+from geocoder.models import GeocodingTask
+
+MAX_BACKOFF = 60 * 60 * 24
+
+
+def claim_tasks(batch_size, max_attempts):
+    """Pick due tasks and push their next attempt past the batch duration.
+
+    Other workers skip claimed tasks, and the claim runs out by itself if
+    this worker dies. No transaction stays open during the HTTP requests.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = list(
+            GeocodingTask.objects
+            .filter(attempts__lt=max_attempts, next_attempt_at__lte=now)
+            .select_for_update(skip_locked=True)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        claimed_until = now + timedelta(seconds=estimate_fetch_duration(len(tasks)))
+        GeocodingTask.objects.filter(id__in=[task.id for task in tasks]).update(
+            next_attempt_at=claimed_until,
+        )
+    return tasks
+
+
+def get_backoff(attempts, backoff):
+    return timedelta(seconds=min(backoff * 2 ** (attempts - 1), MAX_BACKOFF))
+
+
+def process_tasks(batch_size, max_attempts, backoff):
+    """Geocode one batch, return (claimed, geocoded) task counts."""
+    tasks = claim_tasks(batch_size, max_attempts)
+    if not tasks:
+        return 0, 0
+
+    coordinates = fetch_coordinates_by_addresses(
+        [task.address for task in tasks],
+        settings.GEOCODER_TOKEN,
+    )
+    done_ids = [task.id for task in tasks if task.address in coordinates]
+    failed_tasks = [task for task in tasks if task.address not in coordinates]
+
+    now = timezone.now()
+    with transaction.atomic():
+        GeocodingTask.objects.filter(id__in=done_ids).delete()
+        for task in failed_tasks:
+            task.attempts += 1
+            task.next_attempt_at = now + get_backoff(task.attempts, backoff)
+        GeocodingTask.objects.bulk_update(failed_tasks, ['attempts', 'next_attempt_at'])
+    return len(tasks), len(done_ids)
+
+
+class Command(BaseCommand):
+    help = 'Geocode queued addresses of orders and restaurants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch_size', type=int, default=50)
+        parser.add_argument('--max_attempts', type=int, default=settings.GEOCODER_MAX_ATTEMPTS)
+        parser.add_argument('--backoff', type=float, default=30,
+            help='Seconds before the first retry of a failed address, doubled on every next one')
+        parser.add_argument('--sleep', type=float, default=5,
+            help='Seconds to wait when the queue is empty or a batch failed completely')
+        parser.add_argument('--once', action='store_true',
+            help='Exit when no address is due')
+
+    def handle(self, *args, **options):
+        while True:
+            claimed, geocoded = process_tasks(
+                options['batch_size'],
+                options['max_attempts'],
+                options['backoff'],
+            )
+            if claimed:
+                self.stdout.write(f'Geocoded {geocoded} of {claimed} addresses')
+            if geocoded:
+                continue
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
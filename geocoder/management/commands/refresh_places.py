@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from geocoder.geocoder_functions import fetch_coordinates_by_addresses
+from geocoder.models import Place
+
+
+class Command(BaseCommand):
+    help = 'Re-geocode cached places which are expired or will expire soon'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=60 * 60 * 24,
+            help='Also refresh places expiring within this many seconds')
+        parser.add_argument('--batch_size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        stale_at = timezone.now() + timedelta(seconds=options['ahead'])
+        addresses = list(
+            Place.objects
+            .expired(stale_at)
+            .order_by('fetch_coordinates_at')
+            .values_list('address', flat=True)
+        )
+        self.stdout.write(f'Found {len(addresses)} places to refresh')
+
+        refreshed = 0
+        batch_size = options['batch_size']
+        for batch_start in range(0, len(addresses), batch_size):
+            batch = addresses[batch_start:batch_start + batch_size]
+            coordinates = fetch_coordinates_by_addresses(
+                batch,
+                settings.GEOCODER_TOKEN,
+                stale_at=stale_at,
+            )
+            refreshed += len(coordinates)
+            self.stdout.write(f'Refreshed {refreshed} of {len(addresses)} places')
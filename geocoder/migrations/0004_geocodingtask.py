@@ -0,0 +1,31 @@
+# Generated by Django 3.2 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocoder', '0003_auto_20220221_1212'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodingTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=200, unique=True, verbose_name='Адрес')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата постановки в очередь')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+            ],
+            options={
+                'verbose_name': 'Адрес в очереди геокодера',
+                'verbose_name_plural': 'Очередь геокодера',
+            },
+        ),
+        migrations.AlterField(
+            model_name='place',
+            name='address',
+            field=models.CharField(db_index=True, max_length=200, unique=True, verbose_name='Адрес места'),
+        ),
+    ]
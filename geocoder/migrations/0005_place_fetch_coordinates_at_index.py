@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocoder', '0004_geocodingtask'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='place',
+            name='fetch_coordinates_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата запроса координат'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+from geocoder.addresses import normalize_address
+
+
+def fill_normalized_address(apps, schema_editor):
+    Place = apps.get_model('geocoder', 'Place')
+    places = []
+    for place in Place.objects.only('id', 'address').iterator():
+        place.normalized_address = normalize_address(place.address)
+        places.append(place)
+    Place.objects.bulk_update(places, ['normalized_address'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocoder', '0005_place_fetch_coordinates_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='normalized_address',
+            field=models.CharField(blank=True, db_index=True, max_length=200, verbose_name='Нормализованный адрес'),
+        ),
+        migrations.RunPython(fill_normalized_address, migrations.RunPython.noop),
+    ]
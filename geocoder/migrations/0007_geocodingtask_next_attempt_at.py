@@ -0,0 +1,19 @@
+# Generated by Django 3.2 on 2026-10-18 18:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocoder', '0006_place_normalized_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geocodingtask',
+            name='next_attempt_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Следующая попытка не раньше'),
+        ),
+    ]
@@ -1,23 +1,98 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from .addresses import normalize_address
+
+
+class PlaceQuerySet(models.QuerySet):
+    def expired(self, moment):
+        """Places whose hit or miss TTL is over at `moment`."""
+        return self.filter(
+            Q(
+                latitude__isnull=False,
+                fetch_coordinates_at__lt=moment - timedelta(seconds=settings.GEOCODER_HIT_TTL),
+            )
+            | Q(
+                latitude__isnull=True,
+                fetch_coordinates_at__lt=moment - timedelta(seconds=settings.GEOCODER_MISS_TTL),
+            )
+        )
 
 
 class Place(models.Model):
     address = models.CharField(
         'Адрес места',
-        max_length=100,
+        max_length=200,
         unique=True,
         db_index=True,
     )
+    normalized_address = models.CharField(
+        'Нормализованный адрес',
+        max_length=200,
+        db_index=True,
+        blank=True,
+    )
     latitude = models.FloatField('Широта', blank=True, null=True)
     longitude = models.FloatField('Долгота', blank=True, null=True)
     fetch_coordinates_at = models.DateTimeField(
         'Дата запроса координат',
         auto_now_add=True,
+        db_index=True,
     )
 
+    objects = PlaceQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Место'
         verbose_name_plural = 'Места'
 
     def __str__(self):
         return self.address
+
+    def save(self, *args, **kwargs):
+        self.normalized_address = normalize_address(self.address)
+        super().save(*args, **kwargs)
+
+    @property
+    def coordinates(self):
+        if self.longitude is None or self.latitude is None:
+            return None
+        return self.longitude, self.latitude
+
+    @property
+    def expires_at(self):
+        ttl = settings.GEOCODER_MISS_TTL if self.coordinates is None else settings.GEOCODER_HIT_TTL
+        return self.fetch_coordinates_at + timedelta(seconds=ttl)
+
+    def is_expired(self, moment):
+        return self.expires_at < moment
+
+
+class GeocodingTask(models.Model):
+    address = models.CharField(
+        'Адрес',
+        max_length=200,
+        unique=True,
+    )
+    created_at = models.DateTimeField(
+        'Дата постановки в очередь',
+        auto_now_add=True,
+        db_index=True,
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    next_attempt_at = models.DateTimeField(
+        'Следующая попытка не раньше',
+        default=timezone.now,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'Адрес в очереди геокодера'
+        verbose_name_plural = 'Очередь геокодера'
+
+    def __str__(self):
+        return self.address
@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .geocoder_functions import bump_places_version
+from .models import Place
+
+
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+def invalidate_places_cache(sender, **kwargs):
+    transaction.on_commit(bump_places_version)
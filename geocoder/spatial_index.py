@@ -0,0 +1,81 @@
+import math
+from collections import defaultdict
+
+import numpy as np
+
+from geocoder.distances import EARTH_RADIUS_KM, haversine_matrix, to_lonlat_array
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+
+class GridIndex:
+    """Uniform lat/lon grid over points for radius and k-nearest queries.
+
+    Points are given as {key: (lon, lat)}, the ones without coordinates are
+    skipped. Distances are haversine, in km.
+    """
+
+    def __init__(self, points, cell_size=0.1):
+        self.cell_size = cell_size
+        self.points = {}
+        self.cells = defaultdict(list)
+        for key, lonlat in points.items():
+            if not lonlat or None in lonlat:
+                continue
+            lon, lat = float(lonlat[0]), float(lonlat[1])
+            self.points[key] = lon, lat
+            self.cells[self.get_cell(lon, lat)].append((key, lon, lat))
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, key):
+        return key in self.points
+
+    def get_cell(self, lon, lat):
+        return math.floor(lon / self.cell_size), math.floor(lat / self.cell_size)
+
+    def get_candidates(self, lon, lat, radius_km):
+        lat_span = radius_km / KM_PER_DEGREE
+        max_lat = min(abs(lat) + lat_span, 90)
+        lon_span = min(radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(max_lat)), 1e-6)), 180)
+
+        min_lon_cell, min_lat_cell = self.get_cell(lon - lon_span, lat - lat_span)
+        max_lon_cell, max_lat_cell = self.get_cell(lon + lon_span, lat + lat_span)
+        if (max_lon_cell - min_lon_cell + 1) * (max_lat_cell - min_lat_cell + 1) > len(self.cells):
+            return [point for points in self.cells.values() for point in points]
+
+        return [
+            point
+            for lon_cell in range(min_lon_cell, max_lon_cell + 1)
+            for lat_cell in range(min_lat_cell, max_lat_cell + 1)
+            for point in self.cells.get((lon_cell, lat_cell), [])
+        ]
+
+    def within(self, lon, lat, radius_km):
+        """Return [(key, distance)] of points within radius, nearest first."""
+        candidates = self.get_candidates(float(lon), float(lat), radius_km)
+        if not candidates:
+            return []
+
+        distances = haversine_matrix(
+            to_lonlat_array([(lon, lat)]),
+            np.array([(point_lon, point_lat) for _, point_lon, point_lat in candidates]),
+        )[0]
+        found = [
+            (key, float(distance))
+            for (key, _, _), distance in zip(candidates, distances)
+            if distance <= radius_km
+        ]
+        found.sort(key=lambda key_distance: key_distance[1])
+        return found
+
+    def nearest(self, lon, lat, k=1):
+        """Return up to k [(key, distance)] nearest points, nearest first."""
+        radius_km = self.cell_size * KM_PER_DEGREE
+        while True:
+            found = self.within(lon, lat, radius_km)
+            if len(found) >= k or radius_km >= MAX_DISTANCE_KM:
+                return found[:k]
+            radius_km *= 2
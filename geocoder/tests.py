@@ -1,3 +1,128 @@
-from django.test import TestCase
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from geocoder import geocoder_functions
+from geocoder.addresses import normalize_address
+from geocoder.geocoder_functions import (RateLimiter, SingleFlight,
+                                         acquire_leases,
+                                         fetch_coordinates_by_addresses,
+                                         release_leases)
+from geocoder.models import Place
+
+
+class SingleFlightTest(TestCase):
+    def run_concurrently(self, func, threads_count=5):
+        single_flight = SingleFlight()
+        results = []
+        errors = []
+
+        def call():
+            try:
+                results.append(single_flight.do('key', func))
+            except ValueError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=call) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_calls_share_one_result(self):
+        calls = []
+
+        def func():
+            calls.append(1)
+            time.sleep(0.2)
+            return len(calls)
+
+        results, errors = self.run_concurrently(func)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(errors, [])
+
+    def test_error_reaches_every_caller(self):
+        def func():
+            time.sleep(0.2)
+            raise ValueError('geocoder is down')
+
+        results, errors = self.run_concurrently(func)
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 5)
+
+    def test_key_is_free_after_call(self):
+        single_flight = SingleFlight()
+        single_flight.do('key', lambda: 1)
+
+        self.assertEqual(single_flight.do('key', lambda: 2), 2)
+
+
+class RateLimiterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(GEOCODER_RATE_LIMIT=5)
+    def test_limiters_with_one_key_share_the_limit(self):
+        limiters = [RateLimiter('test:rate'), RateLimiter('test:rate')]
+        started_at = time.time()
+
+        for limiter in limiters * 3:
+            limiter.wait()
+
+        # six calls take five 0.2 s slots, the first one may be under way
+        self.assertGreater(time.time() - started_at, 0.8)
+
+
+class LeasesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_lease_is_exclusive_until_released(self):
+        self.assertEqual(acquire_leases(['a', 'b']), {'a', 'b'})
+        self.assertEqual(acquire_leases(['a', 'c']), {'c'})
+
+        release_leases(['a'])
+
+        self.assertEqual(acquire_leases(['a', 'b']), {'a'})
+
+    @override_settings(GEOCODER_TIMEOUT=0.5, GEOCODER_RATE_LIMIT=0)
+    def test_busy_address_is_fetched_last_and_never_twice(self):
+        own_address, busy_address = 'Москва, Своя 1', 'Москва, Чужая 2'
+        acquire_leases([normalize_address(busy_address)])
+        requested = []
+
+        def fetch_coordinates(apikey, address, session=None):
+            requested.append(address)
+            return 37.0, 55.0
+
+        with mock.patch.object(geocoder_functions, 'fetch_coordinates', fetch_coordinates):
+            with self.captureOnCommitCallbacks(execute=True):
+                coordinates = fetch_coordinates_by_addresses([own_address, busy_address], 'key')
+
+        self.assertEqual(requested, [own_address])
+        self.assertEqual(coordinates, {own_address: (37.0, 55.0)})
+        self.assertTrue(Place.objects.filter(address=own_address).exists())
+        self.assertEqual(acquire_leases([normalize_address(own_address)]), {normalize_address(own_address)})
+
+    @override_settings(GEOCODER_TIMEOUT=2, GEOCODER_RATE_LIMIT=0)
+    def test_busy_address_is_taken_from_other_process(self):
+        busy_address = 'Москва, Чужая 3'
+        acquire_leases([normalize_address(busy_address)])
+
+        def other_process_finishes():
+            Place.objects.create(address=busy_address, longitude=37.5, latitude=55.5)
+            release_leases([normalize_address(busy_address)])
+
+        with mock.patch.object(geocoder_functions, 'fetch_coordinates') as fetch_coordinates:
+            with mock.patch.object(geocoder_functions.time, 'sleep', lambda _: other_process_finishes()):
+                coordinates = fetch_coordinates_by_addresses([busy_address], 'key')
+
+        fetch_coordinates.assert_not_called()
+        self.assertEqual(coordinates, {busy_address: (37.5, 55.5)})
@@ -1,5 +1,9 @@
 from django.urls import path
 
+from . import views
+
 app_name = "geocoder"
 
-urlpatterns = []
+urlpatterns = [
+    path('cache-stats/', views.places_cache_stats, name="places_cache_stats"),
+]
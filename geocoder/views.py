@@ -1,3 +1,9 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 
-# Create your views here.
+from .geocoder_functions import get_places_cache_stats
+
+
+@staff_member_required
+def places_cache_stats(request):
+    return JsonResponse(get_places_cache_stats())
@@ -1,21 +1,28 @@
-from operator import itemgetter
+from datetime import datetime, time
 
 from django import forms
-from django.db.models import Prefetch
 from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import user_passes_test
+from django.db.models import Q
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views import View
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 
-from foodcartapp.models import (Order, OrderItem, Product, Restaurant,
-                                RestaurantMenuItem)
-from geocoder.geocoder_functions import (calculate_distance,
-                                         fetch_coordinates_by_addresses)
+from foodcartapp.export import EXPORT_FORMATS, iter_orders_with_items
+from foodcartapp.menu_cache import (MENU_CACHE_TIMEOUT, get_availability_matrix,
+                                    get_menu_version, get_restaurant_index)
+from foodcartapp.models import Order, OrderItem, Restaurant
+from geocoder.distances import distance_matrix
+from geocoder.geocoder_functions import enqueue_addresses, get_existed_places
+
+ORDERS_PAGE_SIZE = 50
 
 
 class Login(forms.Form):
@@ -70,35 +77,32 @@ def is_manager(user):
     return user.is_staff  # FIXME replace with specific permission
 
 
-@user_passes_test(is_manager, login_url='restaurateur:login')
-def view_products(request):
-    restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
-
-    default_availability = {restaurant.id: False for restaurant in restaurants}
-    products_with_restaurants = []
-    for product in products:
-
-        availability = {
-            **default_availability,
-            **{item.restaurant_id: item.availability for item in product.menu_items.all()},
-        }
-        orderer_availability = [availability[restaurant.id] for restaurant in restaurants]
+def get_products_matrix():
+    restaurants, products = get_availability_matrix()
+    columns = range(len(restaurants))
+    return {
+        'restaurants': restaurants,
+        'products_with_restaurants': [
+            (product, [bool(availability_bits >> column & 1) for column in columns])
+            for product, availability_bits in products
+        ],
+    }
 
-        products_with_restaurants.append(
-            (product, orderer_availability)
-        )
 
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_products(request):
     return render(request, template_name="products_list.html", context={
-        'products_with_restaurants': products_with_restaurants,
-        'restaurants': restaurants,
+        'menu_version': get_menu_version(),
+        'menu_cache_timeout': MENU_CACHE_TIMEOUT,
+        # Called by the template only when the fragment cache misses
+        'products_matrix': get_products_matrix,
     })
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_restaurants(request):
     return render(request, template_name="restaurants_list.html", context={
-        'restaurants': Restaurant.objects.all(),
+        'restaurants': Restaurant.objects.select_related('load'),
     })
 
 
@@ -113,6 +117,7 @@ class RestaurantSerializer(ModelSerializer):
     class Meta:
         model = Restaurant
         fields = [
+            'id',
             'name',
             'contact_phone',
             'address',
@@ -120,7 +125,8 @@ class RestaurantSerializer(ModelSerializer):
 
 
 def get_distance(obj):
-    return obj.get('distance') or float('inf')
+    distance = obj.get('distance')
+    return float('inf') if distance is None else distance
 
 
 class OrderSerializer(ModelSerializer):
@@ -154,55 +160,203 @@ class OrderSerializer(ModelSerializer):
         return restaurants
 
 
-def get_coordinates(orders):
-    orders_address = [order['address'] for order in orders]
-    restaurants_address = [
-        restaurant.address for restaurant in Restaurant.objects.all()
-    ]
-    coordinates = fetch_coordinates_by_addresses(
-        [*restaurants_address, *orders_address],
-        settings.GEOCODER_TOKEN
+class OrderFilterForm(forms.Form):
+    status = forms.ChoiceField(
+        label='Статус',
+        required=False,
+        choices=[('', 'Все незавершённые'), *Order.OrderStatus.choices],
+    )
+    payment_method = forms.ChoiceField(
+        label='Способ оплаты',
+        required=False,
+        choices=[('', 'Любой'), *Order.PaymentMethod.choices],
+    )
+    restaurant = forms.ModelChoiceField(
+        label='Ресторан',
+        required=False,
+        queryset=Restaurant.objects.order_by('name'),
+        empty_label='Любой',
     )
+    created_from = forms.DateField(
+        label='Создан с',
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'),
+    )
+    created_to = forms.DateField(
+        label='Создан по',
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'),
+    )
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data['cursor']
+        if not cursor:
+            return None
+        try:
+            created_at, order_id = cursor.rsplit('_', 1)
+            return datetime.fromisoformat(created_at), int(order_id)
+        except ValueError:
+            raise forms.ValidationError('Некорректная страница')
+
+
+def encode_cursor(order):
+    return f'{order.created_at.isoformat()}_{order.id}'
+
+
+def filter_orders(orders, filters):
+    if filters.get('status'):
+        orders = orders.filter(status=filters['status'])
+    else:
+        orders = orders.exclude(status=Order.OrderStatus.DONE)
+    if filters.get('payment_method'):
+        orders = orders.filter(payment_method=filters['payment_method'])
+    if filters.get('restaurant'):
+        orders = orders.filter(restaurant=filters['restaurant'])
+
+    current_timezone = timezone.get_current_timezone()
+    if filters.get('created_from'):
+        created_from = datetime.combine(filters['created_from'], time.min)
+        orders = orders.filter(
+            created_at__gte=timezone.make_aware(created_from, current_timezone)
+        )
+    if filters.get('created_to'):
+        created_to = datetime.combine(filters['created_to'], time.max)
+        orders = orders.filter(
+            created_at__lte=timezone.make_aware(created_to, current_timezone)
+        )
+
+    if filters.get('cursor'):
+        created_at, order_id = filters['cursor']
+        orders = orders.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=order_id)
+        )
+    return orders.order_by('created_at', 'id')
+
+
+def get_coordinates(orders):
+    """Read known coordinates only, geocoding runs in the geocode_worker."""
+    addresses = {order['address'] for order in orders}
+    coordinates = get_existed_places(addresses)
+    enqueue_addresses(addresses - coordinates.keys())
     return coordinates
 
 
+def rank_restaurants(order_coordinates, restaurants, restaurant_index):
+    """Sort restaurants by distance to the order.
+
+    The search radius only limits the exact distance calculation: farther
+    restaurants keep their haversine distance, are flagged `out_of_radius`
+    and go after the near ones. Restaurants with unknown coordinates are
+    kept at the end.
+    """
+    nearby = dict(restaurant_index.within(
+        *order_coordinates,
+        settings.RESTAURANT_SEARCH_RADIUS_KM,
+    ))
+    located = [restaurant for restaurant in restaurants if restaurant['id'] in restaurant_index]
+    near = [restaurant for restaurant in located if restaurant['id'] in nearby]
+    far = [restaurant for restaurant in located if restaurant['id'] not in nearby]
+
+    if settings.GEOCODER_EXACT_DISTANCE and near:
+        near_distances = distance_matrix(
+            [order_coordinates],
+            [restaurant_index.points[restaurant['id']] for restaurant in near],
+            exact=True,
+        )[0]
+    else:
+        near_distances = [nearby[restaurant['id']] for restaurant in near]
+    for restaurant, distance in zip(near, near_distances):
+        restaurant['distance'] = float(distance)
+        restaurant['out_of_radius'] = False
+
+    if far:
+        far_distances = distance_matrix(
+            [order_coordinates],
+            [restaurant_index.points[restaurant['id']] for restaurant in far],
+        )[0]
+        for restaurant, distance in zip(far, far_distances):
+            restaurant['distance'] = float(distance)
+            restaurant['out_of_radius'] = True
+
+    not_located = [
+        restaurant for restaurant in restaurants
+        if restaurant['id'] not in restaurant_index
+    ]
+    for restaurant in not_located:
+        restaurant['distance'] = None
+    return sorted(near, key=get_distance) + sorted(far, key=get_distance) + not_located
+
+
 def join_distances(orders):
     coordinates = get_coordinates(orders)
+    restaurant_index = get_restaurant_index()
     for order in orders:
-        for restaurant in order['available_restaurants']:
-            restaurant['distance'] = calculate_distance(
-                coordinates.get(order['address']),
-                coordinates.get(restaurant['address']),
-            )
-
-        sorted_restaurants = sorted(
+        order_coordinates = coordinates.get(order['address'])
+        if not order_coordinates or None in order_coordinates:
+            for restaurant in order['available_restaurants']:
+                restaurant['distance'] = None
+            continue
+
+        order['available_restaurants'] = rank_restaurants(
+            order_coordinates,
             order['available_restaurants'],
-            key=get_distance
+            restaurant_index,
         )
-        order['available_restaurants'] = sorted_restaurants
     return orders
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    menu_item_qs = (
-        RestaurantMenuItem.objects
-        .filter(availability=True)
-        .select_related('restaurant')
-    )
+    filter_form = OrderFilterForm(request.GET)
+    filters = filter_form.cleaned_data if filter_form.is_valid() else {}
+
     orders = (
-        Order.objects
-        .exclude(status=Order.OrderStatus.DONE)
-        .prefetch_related(
-            Prefetch('order_items__product__menu_items', queryset=menu_item_qs)
-        )
-        .calculate_total_cost()
-        .join_restaurants()
+        filter_orders(Order.objects.all(), filters)
+        .prefetch_related('order_items')
     )
+    orders = list(orders[:ORDERS_PAGE_SIZE + 1].join_restaurants())
+
+    first_page_url = None
+    if filters.get('cursor'):
+        first_page_query = request.GET.copy()
+        del first_page_query['cursor']
+        first_page_url = f'?{first_page_query.urlencode()}'
+
+    next_page_url = None
+    if len(orders) > ORDERS_PAGE_SIZE:
+        orders = orders[:ORDERS_PAGE_SIZE]
+        next_page_query = request.GET.copy()
+        next_page_query['cursor'] = encode_cursor(orders[-1])
+        next_page_url = f'?{next_page_query.urlencode()}'
 
     serialized_orders = OrderSerializer(orders, many=True)
     orders_with_distances = join_distances(serialized_orders.data)
 
     return render(request, template_name='order_items.html', context={
-        'orders': sorted(orders_with_distances, key=itemgetter('id'))
+        'orders': orders_with_distances,
+        'filter_form': filter_form,
+        'first_page_url': first_page_url,
+        'next_page_url': next_page_url,
     })
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def export_orders(request):
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Unknown export format')
+
+    since = request.GET.get('since')
+    if since:
+        since = parse_datetime(since)
+        if not since:
+            return HttpResponseBadRequest('since must be an ISO datetime')
+
+    serialize, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(
+        serialize(iter_orders_with_items(since)),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="orders.{export_format}"'
+    return response
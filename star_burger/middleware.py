@@ -0,0 +1,61 @@
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('star_burger.metrics')
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started_at
+
+
+class RequestMetricsMiddleware:
+    """Measure wall time, SQL query count and SQL time of sampled requests.
+
+    Numbers go to the `Server-Timing` header and, as one JSON line per
+    request, to the `star_burger.metrics` logger. Streaming responses are
+    measured until the view returns, not until the last chunk is sent.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        query_counter = QueryCounter()
+        started_at = time.perf_counter()
+        with connection.execute_wrapper(query_counter):
+            response = self.get_response(request)
+        total_time = time.perf_counter() - started_at
+
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={total_time * 1000:.1f}',
+            f'db;dur={query_counter.duration * 1000:.1f};desc="{query_counter.count} queries"',
+        ])
+        resolver_match = request.resolver_match
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': resolver_match.view_name if resolver_match else None,
+            'status': response.status_code,
+            'total_ms': round(total_time * 1000, 1),
+            'db_queries': query_counter.count,
+            'db_ms': round(query_counter.duration * 1000, 1),
+        }))
+        return response
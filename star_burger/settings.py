@@ -3,9 +3,6 @@ import os
 import dj_database_url
 from environs import Env
 
-from git import Repo
-import rollbar
-
 env = Env()
 env.read_env()
 
@@ -34,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'star_burger.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,6 +88,8 @@ DATABASES = {"default": env.dj_db_url(
     default='sqlite:////{0}'.format(os.path.join(BASE_DIR, 'db.sqlite3'))
 )}
 
+CACHES = {"default": env.dj_cache_url("CACHE_URL", default='locmem://')}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -127,16 +127,63 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "bundles"),
 ]
 
+IDEMPOTENCY_KEY_TTL = env.int('IDEMPOTENCY_KEY_TTL', 60 * 60 * 24)
+
 GEOCODER_TOKEN = env('GEOCODER_TOKEN')
+GEOCODER_URL = env('GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x')
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 5)
+GEOCODER_MAX_WORKERS = env.int('GEOCODER_MAX_WORKERS', 8)
+GEOCODER_RATE_LIMIT = env.float('GEOCODER_RATE_LIMIT', 10)
+GEOCODER_MAX_ATTEMPTS = env.int('GEOCODER_MAX_ATTEMPTS', 5)
+GEOCODER_HIT_TTL = env.int('GEOCODER_HIT_TTL', 60 * 60 * 24 * 90)
+GEOCODER_MISS_TTL = env.int('GEOCODER_MISS_TTL', 60 * 60 * 24)
+GEOCODER_LRU_SIZE = env.int('GEOCODER_LRU_SIZE', 10000)
+GEOCODER_LRU_TTL = env.int('GEOCODER_LRU_TTL', 60)
+GEOCODER_EXACT_DISTANCE = env.bool('GEOCODER_EXACT_DISTANCE', False)
+RESTAURANT_SEARCH_RADIUS_KM = env.float('RESTAURANT_SEARCH_RADIUS_KM', 50)
+
+AUTO_ASSIGN_RESTAURANTS = env.bool('AUTO_ASSIGN_RESTAURANTS', True)
+ASSIGNMENT_SCORER = env(
+    'ASSIGNMENT_SCORER',
+    'foodcartapp.assignment.score_by_distance_and_load',
+)
+ASSIGNMENT_LOAD_PENALTY_KM = env.float('ASSIGNMENT_LOAD_PENALTY_KM', 1)
+
+REQUEST_METRICS_SAMPLE_RATE = env.float('REQUEST_METRICS_SAMPLE_RATE', 0.1)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'star_burger.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
 
 ROLLBAR_TOKEN = env('ROLLBAR_TOKEN', '')
 ROLLBAR_ENV_LABEL = env('ROLLBAR_ENV_LABEL', 'production')
-local_repo = Repo(path=BASE_DIR)
-local_branch = local_repo.active_branch.name
+
+
+def read_release(release_file):
+    try:
+        with open(release_file) as file_obj:
+            return file_obj.read().strip()
+    except FileNotFoundError:
+        return 'unknown'
+
+
+# Written by starburger_deploy.sh, so no git calls happen at startup
+RELEASE = env('RELEASE', '') or read_release(os.path.join(BASE_DIR, 'RELEASE'))
 ROLLBAR = {
     'access_token': ROLLBAR_TOKEN,
-    'environment': f'{ROLLBAR_ENV_LABEL}:{local_branch}',
+    'environment': f'{ROLLBAR_ENV_LABEL}:{RELEASE}',
     'root': BASE_DIR,
 }
-rollbar.init(**ROLLBAR)
 